@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Measures per-call overhead of the @cached decorator on cache hits. The legacy
+decorator built its keys as ``args + util.flatten(kwargs)``.
+'''
+
+import os
+import sys
+import timeit
+from functools import wraps
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lmi.shell import util
+from lmi.shell.core import cache
+
+
+def legacy_cached(func):
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        saved = args[0].cache
+        k = args + util.flatten(kwargs)
+        if k in saved:
+            return saved[k]
+        result = func(*args, **kwargs)
+        saved[k] = result
+        return result
+    return wrapped
+
+
+class Client(cache.CacheBase):
+    def GetClass(self, ClassName, namespace=None, LocalOnly=True,
+                 IncludeQualifiers=True, IncludeClassOrigin=False,
+                 PropertyList=None):
+        return ClassName
+
+    legacy_GetClass = legacy_cached(GetClass)
+    new_GetClass = cache.cached(nocase=('ClassName', 'namespace'))(GetClass)
+
+
+def bench(func, number):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def positional(method):
+    return lambda: method('CIM_Foo', 'root/cimv2')
+
+
+def keywords(method):
+    return lambda: method(
+        'CIM_Foo', 'root/cimv2', LocalOnly=False, IncludeQualifiers=False)
+
+
+if __name__ == '__main__':
+    number = 100000
+    client = Client()
+    for call in (positional, keywords):
+        legacy = bench(call(client.legacy_GetClass), number)
+        new = bench(call(client.new_GetClass), number)
+        print '%-12s legacy: %6.2f us/call  new: %6.2f us/call' % (
+            call.__name__, legacy, new)
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Measures per-property cost of casting values to LMI and CIM types. The legacy
+casts built a dictionary of lambdas on every call and ran isinstance() checks
+for every value.
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lmi.shell.core import wbem
+from lmi.shell.util import cast, transform
+
+
+def legacy_do_cast(t, value, cast):
+    cast_func = cast.get(t.lower(), lambda x: x)
+    if isinstance(value, (dict, wbem.NocaseDict)):
+        return wbem.NocaseDict(
+            dict((k, legacy_do_cast(t, v, cast)) for k, v in value.iteritems()))
+    elif isinstance(value, list):
+        return [legacy_do_cast(t, v, cast) for v in value]
+    elif isinstance(value, tuple):
+        return (legacy_do_cast(t, v, cast) for v in value)
+    return cast_func(value) if value is not None else value
+
+
+def legacy_to_cim(t, value):
+    cast = {
+        'sint8': lambda x: wbem.Sint8(x),
+        'uint8': lambda x: wbem.Uint8(x),
+        'sint16': lambda x: wbem.Sint16(x),
+        'uint16': lambda x: wbem.Uint16(x),
+        'sint32': lambda x: wbem.Sint32(x),
+        'uint32': lambda x: wbem.Uint32(x),
+        'sint64': lambda x: wbem.Sint64(x),
+        'uint64': lambda x: wbem.Uint64(x),
+        'string': lambda x: unicode(x, 'utf-8') if isinstance(x, str) else x,
+    }
+    return legacy_do_cast(t, value, cast)
+
+
+def legacy_to_lmi(t, value):
+    cast = {
+        'sint8': lambda x: int(x),
+        'uint8': lambda x: int(x),
+        'sint16': lambda x: int(x),
+        'uint16': lambda x: int(x),
+        'sint32': lambda x: int(x),
+        'uint32': lambda x: int(x),
+        'sint64': lambda x: int(x),
+        'uint64': lambda x: int(x),
+    }
+    return legacy_do_cast(t, value, cast)
+
+
+def legacy_transform(conn, value):
+    if isinstance(value, wbem.CIMInstance):
+        return value
+    elif isinstance(value, wbem.CIMInstanceName):
+        return value
+    elif isinstance(value, wbem.CIMInt):
+        return int(value)
+    elif isinstance(value, wbem.CIMFloat):
+        return float(value)
+    elif isinstance(value, (dict, wbem.NocaseDict)):
+        return wbem.NocaseDict(
+            dict((k, legacy_transform(conn, v)) for k, v in value.iteritems()))
+    elif isinstance(value, list):
+        return [legacy_transform(conn, val) for val in value]
+    elif isinstance(value, tuple):
+        return (legacy_transform(conn, val) for val in value)
+    return value
+
+
+def bench(func, number):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+if __name__ == '__main__':
+    number = 100000
+    uint32 = wbem.Uint32(42)
+    array = [wbem.Uint16(i) for i in xrange(16)]
+
+    cases = (
+        ('to_lmi uint32', legacy_to_lmi, cast.to_lmi, ('uint32', uint32)),
+        ('to_lmi string', legacy_to_lmi, cast.to_lmi, ('string', u'foo')),
+        ('to_lmi uint16[16]', legacy_to_lmi, cast.to_lmi, ('uint16', array)),
+        ('to_cim uint32', legacy_to_cim, cast.to_cim, ('uint32', 42)),
+        ('to_cim string', legacy_to_cim, cast.to_cim, ('string', 'foo')),
+        ('transform uint32', legacy_transform, transform.to_lmi,
+            (None, uint32)),
+        ('transform string', legacy_transform, transform.to_lmi,
+            (None, u'foo')),
+    )
+    for name, legacy, new, args in cases:
+        print '%-18s  legacy: %5.2f us/call  new: %5.2f us/call' % (
+            name, bench(lambda: legacy(*args), number),
+            bench(lambda: new(*args), number))
@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compares memory and time of materializing 100k instances into rows of
+property dictionaries, as analysis scripts do, and into columns.
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lmi.shell.core import wbem
+from lmi.shell.util import cast, columns
+
+
+def make_instances(number):
+    return [
+        wbem.CIMInstance('LMI_Foo', properties={
+            'Name': wbem.CIMProperty('Name', u'foo%d' % i, type='string'),
+            'PID': wbem.CIMProperty('PID', wbem.Uint32(i), type='uint32'),
+            'Load': wbem.CIMProperty('Load', wbem.Real64(i / 10.0),
+                                     type='real64')})
+        for i in xrange(number)]
+
+
+def rows(cim_insts):
+    return [
+        dict((name, cast.to_lmi(prop.type, prop.value))
+             for name, prop in cim_inst.properties.iteritems())
+        for cim_inst in cim_insts]
+
+
+def rows_size(result):
+    size = sys.getsizeof(result)
+    for row in result:
+        size += sys.getsizeof(row)
+        size += sum(sys.getsizeof(value) for value in row.itervalues())
+    return size
+
+
+def columns_size(result):
+    size = 0
+    for column in result.columns.itervalues():
+        # Sizes of arrays include their items.
+        size += sys.getsizeof(column.values)
+        if column.typecode is None:
+            size += sum(sys.getsizeof(value) for value in column.values)
+    return size
+
+
+def bench(func, arg):
+    start = time.time()
+    result = func(arg)
+    return result, (time.time() - start) * 1e3
+
+
+if __name__ == '__main__':
+    cim_insts = make_instances(100000)
+
+    result, elapsed = bench(rows, cim_insts)
+    print 'rows     %6.1f MB  %6.1f ms' % (rows_size(result) / 1e6, elapsed)
+
+    def to_columns(cim_insts):
+        result = columns.LMIColumns()
+        result.extend(cim_insts)
+        return result
+
+    result, elapsed = bench(to_columns, cim_insts)
+    print 'columns  %6.1f MB  %6.1f ms' % (
+        columns_size(result) / 1e6, elapsed)
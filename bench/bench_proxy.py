@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Measures per-object overhead of creating wrappers through the proxies in
+lmi.shell.obj. The legacy proxy imported the implementation on every call.
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lmi.shell import obj
+from lmi.shell.obj.impl.base import CIMBase
+
+
+class LegacyProxy(object):
+    def __init__(self, module_name, cls_name):
+        self.module_name = module_name
+        self.cls_name = cls_name
+
+    def __call__(self, *args, **kwargs):
+        return self.cls(*args, **kwargs)
+
+    @property
+    def cls(self):
+        m = __import__(
+            'lmi.shell.obj.impl.%s' % self.module_name,
+            fromlist=[self.cls_name])
+        return getattr(m, self.cls_name)
+
+
+def bench(func, number):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+if __name__ == '__main__':
+    number = 100000
+    legacy = LegacyProxy('base', 'CIMBase')
+    proxy = obj._LMIProxy('base', 'CIMBase')
+    wrapper = CIMBase(None)
+
+    for name, func in (
+            ('class', lambda: CIMBase(None)),
+            ('legacy proxy', lambda: legacy(None)),
+            ('proxy', lambda: proxy(None)),
+            ('isinstance', lambda: isinstance(wrapper, proxy))):
+        print '%-12s  %5.2f us/call' % (name, bench(func, number))
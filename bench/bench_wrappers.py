@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Measures memory and creation time of instance wrappers. The legacy
+wrappers kept their state in a per-object __dict__ and were created through
+the SetAttrMeta meta class.
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lmi.shell import obj
+from lmi.shell.core import wbem
+from lmi.shell.util import meta
+
+
+class LegacyInstance(object):
+    __metaclass__ = meta.SetAttrMeta
+
+    def __init__(self, conn, cim_inst, projection=None):
+        self.conn = conn
+        self.cim_obj = cim_inst
+        self._dirty = set()
+        if projection is not None:
+            self._projection = projection
+
+    def __setattr__(self, attr, value):
+        self.__dict__[attr] = value
+
+
+class Connection(object):
+    def is_wsman(self):
+        return False
+
+
+def wrapper_size(wrapper):
+    '''
+    Returns size of a wrapper without the wrapped object.
+    '''
+    size = sys.getsizeof(wrapper)
+    for attrs in (getattr(wrapper, '__dict__', None), wrapper._dirty):
+        if attrs is not None:
+            size += sys.getsizeof(attrs)
+    return size
+
+
+def bench(func, number):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=3, number=1)) / number * 1e6
+
+
+if __name__ == '__main__':
+    number = 100000
+    conn = Connection()
+    cim_inst = wbem.CIMInstance('LMI_Foo', properties={'Name': 'foo'})
+
+    for name, cls in (('legacy', LegacyInstance), ('new', obj.LMIInstance)):
+        create = lambda: [cls(conn, cim_inst) for i in xrange(number)]
+        print '%-6s  size: %4d B/object  create: %5.2f us/object' % (
+            name, wrapper_size(create()[0]), bench(create, number))
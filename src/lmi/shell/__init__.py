@@ -5,4 +5,6 @@ __version__ = '1.0.0'
 
 from obj import *
 from con import *
+from group import *
+from snapshot import *
 from exc import *
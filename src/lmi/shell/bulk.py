@@ -0,0 +1,269 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Operations on many instances at once.
+'''
+
+import contextlib
+import threading
+from collections import namedtuple
+
+from lmi.shell import exc, obj
+from lmi.shell.core import enum, wbem
+from lmi.shell.core.cache import path_key
+from lmi.shell.util import parallel, transform
+
+
+# Strategies of getting many instances.
+STRATEGY_GET = 'get'
+STRATEGY_ENUMERATE = 'enumerate'
+
+# Minimum number of requested instances of one class, for which the class is
+# enumerated instead of getting the instances one by one.
+ENUMERATE_THRESHOLD = 32
+
+# Outcome of a bulk operation on one item; either value, or error is set.
+LMIBulkResult = namedtuple('LMIBulkResult', ['item', 'value', 'error'])
+
+
+def _cim_object(lmi_obj):
+    '''
+    Returns a wrapped CIM object of LMI objects; lmi_obj otherwise.
+    '''
+    if hasattr(lmi_obj, 'wrapped_object'):
+        return lmi_obj.wrapped_object
+    return lmi_obj
+
+
+def get_instances(conn, inst_names, strategy=None,
+                  workers=parallel.DEFAULT_WORKERS, PropertyList=None):
+    '''
+    Returns a list of :py:class:`.LMIInstance` objects for inst_names, in the
+    same order; None stands for instances, which don't exist.
+
+    Names are grouped by class. A class with at least
+    :py:data:`ENUMERATE_THRESHOLD` requested instances is enumerated, other
+    instances are fetched by GetInstance calls run concurrently over the
+    connection's client pool.
+
+    :param conn: :py:class:`.LMIConnection` object
+    :param inst_names: iterable of :py:class:`.LMIInstanceName` objects
+    :param string strategy: :py:data:`STRATEGY_GET` or
+        :py:data:`STRATEGY_ENUMERATE` to force a strategy for all classes;
+        None to choose per class
+    :param int workers: number of concurrent GetInstance calls
+    :param list PropertyList: properties to fetch; None fetches all
+    '''
+    paths = [_cim_object(inst_name) for inst_name in inst_names]
+    results = [None] * len(paths)
+
+    # Group indices of requested instances by namespace and class.
+    groups = {}
+    for index, path in enumerate(paths):
+        namespace = path.namespace or wbem.config.DEFAULT_NAMESPACE
+        group = (namespace, path.classname.lower())
+        groups.setdefault(group, []).append(index)
+
+    to_get = []
+    for (namespace, classname), indices in groups.iteritems():
+        if strategy == STRATEGY_ENUMERATE or (
+                strategy is None and len(indices) >= ENUMERATE_THRESHOLD):
+            _enumerate(conn, namespace, indices, paths, results, PropertyList)
+        else:
+            to_get.extend(indices)
+    _get(conn, to_get, paths, results, workers, PropertyList)
+
+    return [
+        obj.LMIInstance(conn, cim_inst) if cim_inst is not None else None
+        for cim_inst in results]
+
+
+def _enumerate(conn, namespace, indices, paths, results, PropertyList):
+    '''
+    Fills results of requested instances of one class by an enumeration.
+    '''
+    wanted = {}
+    for index in indices:
+        wanted.setdefault(path_key(paths[index], namespace), []).append(index)
+
+    op = enum.OPEnumerateInstances(
+        paths[indices[0]].classname, namespace=namespace, LocalOnly=False,
+        DeepInheritance=False, PropertyList=PropertyList)
+    enumerator = enum.Enumerator(conn.client)
+    enumerator.set_operation(op)
+    for cim_inst in enumerator:
+        for index in wanted.pop(path_key(cim_inst.path, namespace), []):
+            results[index] = cim_inst
+        if not wanted:
+            # Stop the enumeration; all requested instances are here.
+            break
+
+
+def _get(conn, indices, paths, results, workers, PropertyList):
+    '''
+    Fills results of requested instances by GetInstance calls.
+    '''
+    kwargs = {}
+    if PropertyList is not None:
+        kwargs['PropertyList'] = PropertyList
+
+    def get(client, index):
+        try:
+            return client.GetInstance(paths[index], **kwargs)
+        except exc.CIMError as e:
+            if e.args[0] != wbem.CIM_ERR_NOT_FOUND:
+                raise
+            return None
+
+    if workers < 2 or len(indices) < 2 or \
+            not hasattr(conn.client, 'clone'):
+        for index in indices:
+            results[index] = get(conn.client, index)
+        return
+
+    client_pool = conn.client_pool(workers)
+
+    def get_pooled(index):
+        with client_pool.client() as client:
+            return [get(client, index)]
+
+    for index, cim_inst, error in parallel.stream(
+            get_pooled, indices, workers):
+        if error is not None:
+            raise error
+        results[index] = cim_inst
+
+
+@contextlib.contextmanager
+def _single_client(client):
+    yield client
+
+
+def _run(conn, func, items, workers, stop_on_error):
+    '''
+    Calls func(client, item) for all items concurrently over the
+    connection's client pool and returns a list of :py:class:`LMIBulkResult`
+    objects in the order of items. With stop_on_error, items not started
+    before the first failure are reported with
+    :py:exc:`.LMIOperationSkipped`.
+    '''
+    items = list(items)
+    results = [None] * len(items)
+    failed = threading.Event()
+
+    if workers < 2 or len(items) < 2 or not hasattr(conn.client, 'clone'):
+        client = lambda: _single_client(conn.client)
+        workers = 1
+    else:
+        client = conn.client_pool(workers).client
+
+    def call(index):
+        item = items[index]
+        if stop_on_error and failed.is_set():
+            return [LMIBulkResult(item, None, exc.LMIOperationSkipped())]
+        try:
+            with client() as c:
+                value = func(c, item)
+        except Exception as e:
+            failed.set()
+            return [LMIBulkResult(item, None, e)]
+        return [LMIBulkResult(item, value, None)]
+
+    for index, result, error in parallel.stream(
+            call, xrange(len(items)), workers):
+        results[index] = result
+    return results
+
+
+def create_instances(conn, instances, workers=parallel.DEFAULT_WORKERS,
+                     stop_on_error=False):
+    '''
+    Creates many instances concurrently. Values of the results are
+    :py:class:`.LMIInstanceName` objects of the new instances.
+
+    :param conn: :py:class:`.LMIConnection` object
+    :param instances: iterable of :py:class:`wbem.CIMInstance` or
+        :py:class:`.LMIInstance` objects
+    :param int workers: number of concurrent requests
+    :param bool stop_on_error: whether to skip items not started before the
+        first failure
+    :returns: list of :py:class:`LMIBulkResult` objects
+    '''
+    def create(client, inst):
+        return obj.LMIInstanceName(
+            conn, client.CreateInstance(_cim_object(inst)))
+    return _run(conn, create, instances, workers, stop_on_error)
+
+
+def modify_instances(conn, instances, workers=parallel.DEFAULT_WORKERS,
+                     stop_on_error=False):
+    '''
+    Pushes modified properties of many instances concurrently; see
+    :py:meth:`.LMIInstance.push`. Unmodified instances are not sent; their
+    results have value False.
+
+    :param conn: :py:class:`.LMIConnection` object
+    :param instances: iterable of :py:class:`.LMIInstance` objects
+    :param int workers: number of concurrent requests
+    :param bool stop_on_error: whether to skip items not started before the
+        first failure
+    :returns: list of :py:class:`LMIBulkResult` objects
+    '''
+    instances = list(instances)
+    results = [LMIBulkResult(inst, False, None) for inst in instances]
+    indices = [
+        index for index, inst in enumerate(instances)
+        if inst.modified_properties]
+
+    modified = _run(
+        conn, lambda client, inst: inst._push(client),
+        [instances[index] for index in indices], workers, stop_on_error)
+    for index, result in zip(indices, modified):
+        results[index] = result
+    return results
+
+
+def delete_instances(conn, objects, workers=parallel.DEFAULT_WORKERS,
+                     stop_on_error=False):
+    '''
+    Deletes many instances concurrently.
+
+    :param conn: :py:class:`.LMIConnection` object
+    :param objects: iterable of :py:class:`.LMIInstance` or
+        :py:class:`.LMIInstanceName` objects
+    :param int workers: number of concurrent requests
+    :param bool stop_on_error: whether to skip items not started before the
+        first failure
+    :returns: list of :py:class:`LMIBulkResult` objects
+    '''
+    def delete(client, inst):
+        client.DeleteInstance(transform.to_cim_path(_cim_object(inst)))
+    return _run(conn, delete, objects, workers, stop_on_error)
+
+
+def push_instances(conn, instances, workers=parallel.DEFAULT_WORKERS):
+    '''
+    Pushes modified properties of many instances concurrently and raises the
+    first error; see :py:func:`modify_instances`.
+
+    :returns: number of modified instances
+    '''
+    results = modify_instances(conn, instances, workers, stop_on_error=True)
+    for result in results:
+        if result.error is not None and \
+                not isinstance(result.error, exc.LMIOperationSkipped):
+            raise result.error
+    return sum(1 for result in results if result.value)
@@ -7,17 +7,24 @@ import M2Crypto.SSL.Checker
 import M2Crypto.X509
 
 from lmi.shell import core
+from lmi.shell.core import enum, pool
+# bulk needs lmi.shell.core imported first (core -> enum -> exc).
+from lmi.shell import bulk
 from lmi.shell import exc
+from lmi.shell import ind
 from lmi.shell import obj
 from lmi.shell.logger import logger
-from lmi.shell.util import prompt, url, is_negative
+from lmi.shell.util import projection, prompt, url, is_negative
 
 
 # TODO: no exception wrapping
 def connect(uri, username='', password='', key_file=None, cert_file=None,
-            verify_server_cert=True, use_cache=True, prompt_prefix=''):
+            verify_server_cert=True, use_cache=True, prompt_prefix='',
+            cache=None, schema_store=None, schema_version=None,
+            share_schema=False, interactive=True):
     '''
-    Creates a connection object with provided URI and credentials.
+    Creates a connection object with provided URI and credentials. Missing
+    username or password are prompted for, if interactive is True.
     '''
     def is_local_connection(uri, username, password, cert_file, key_file):
         #try:
@@ -30,12 +37,14 @@ def connect(uri, username='', password='', key_file=None, cert_file=None,
     # Create a connection object.
     if is_local_connection(uri, username, password, cert_file, key_file):
         # Connect via UNIX socket.
-        connection = LMIConnection(uri, use_cache=use_cache)
+        connection = LMIConnection(
+            uri, use_cache=use_cache, cache=cache, schema_store=schema_store,
+            schema_version=schema_version, share_schema=share_schema)
     else:
         # If username or password is missing, prompt for one.
         if is_negative(key_file, cert_file):
             res = url.parse(uri)
-            if res.creds is None:
+            if res.creds is None and interactive:
                 try:
                     if not username:
                         username = prompt.prompt_input(prompt_prefix + 'username: ')
@@ -46,14 +55,15 @@ def connect(uri, username='', password='', key_file=None, cert_file=None,
                 except KeyboardInterrupt as e:
                     sys.stdout.write('\n')
                     return None
-            else:
+            elif res.creds is not None:
                 username, password = res.creds
 
         # Connect via HTTP.
         connection = LMIConnection(
             str(res), username, password, key_file=key_file,
             cert_file=cert_file, verify_server_cert=verify_server_cert,
-            use_cache=use_cache)
+            use_cache=use_cache, cache=cache, schema_store=schema_store,
+            schema_version=schema_version, share_schema=share_schema)
 
     try:
         connection.connect()
@@ -71,9 +81,15 @@ class LMIConnection(object):
     CIMOM should have its own connection object created. This class provides an
     entry point to the namespace/classes/instances/methods hierarchy present in
     the LMIShell.
+
+    If share_schema is True, or a fingerprint string, the connection shares
+    cached schema objects with other connections to CIMOMs with the same
+    schema fingerprint; see :py:meth:`.CIMXMLClient.share_schema`.
     '''
     def __init__(self, uri, username='', password='', key_file=None,
-            cert_file=None, verify_server_cert=True, use_cache=True):
+            cert_file=None, verify_server_cert=True, use_cache=True,
+            cache=None, schema_store=None, schema_version=None,
+            share_schema=False):
         # Split uri into elements. Some elements of URL may be missing.
         # They are defaulted by url module.
         res = url.parse_cim(uri)
@@ -90,7 +106,8 @@ class LMIConnection(object):
                 self.url, username, password,
                 key_file=key_file, cert_file=cert_file,
                 verify_server_cert=verify_server_cert,
-                use_cache=use_cache)
+                use_cache=use_cache, cache=cache,
+                schema_store=schema_store, schema_version=schema_version)
         else:
             # We talk to CIMOM via WSMAN
             self.client = core.WSMANClient(
@@ -99,6 +116,16 @@ class LMIConnection(object):
                 verify_server_cert=verify_server_cert)
 
         self.indications = {}
+        self.share_schema = share_schema
+        self.instance_cache_subscription = None
+        # Properties read from enumerated instances; used by enumerations
+        # with PropertyList='auto'.
+        self.property_tracker = projection.PropertyTracker()
+        self.pool = None
+        # Class metadata and property accessors used by instances; see
+        # obj.impl.clsmeta.
+        self.class_metadata = {}
+        self.property_accessors = {}
 
         # TODO: add hook in ind.subscribe() to auto-unsubscribe
         # Register LMIConnection.unsubscribe_all_indications() to be called at
@@ -186,27 +213,203 @@ class LMIConnection(object):
         '''
         if hasattr(self.client, 'cache'):
             self.client.cache.clear()
+        self.class_metadata.clear()
+        self.property_accessors.clear()
+
+    def clear_schema_cache(self):
+        '''
+        Clears the cache and removes schema objects of this CIMOM from the
+        on-disk schema store. If the connection shares schema objects with
+        other connections (see share_schema), the shared cache is cleared for
+        all of them.
+        '''
+        self.clear_cache()
+        if hasattr(self.client, 'schema_cache'):
+            self.client.schema_cache.clear()
+        if getattr(self.client, 'schema_store', None) is not None:
+            self.client.schema_store.invalidate(self.client.url)
+        if hasattr(self.client, 'schema_versions'):
+            # Read schema versions from CIMOM again.
+            self.client.schema_versions.clear()
+            self.client.schema_fingerprints.clear()
+
+    @property
+    def cache_stats(self):
+        '''
+        :returns: :py:class:`.CacheStats` of the client's cache; None, if the
+            client doesn't use a cache
+        '''
+        if hasattr(self.client, 'cache'):
+            return self.client.cache.stats
+        return None
+
+    @property
+    def transport_stats(self):
+        '''
+        :returns: :py:class:`.TransportStats` (connections opened and
+            requests sent) of the connection's client and its pooled clones;
+            None, if the client doesn't count them
+        '''
+        if hasattr(self.client, 'counter'):
+            return self.client.counter.stats
+        return None
 
     def use_cache(self, active=True):
         '''
         Sets a bool flag, which defines, if the LMIShell should use a cache.
+        While the cache is not used, the schema cache shared with other
+        connections is not used either.
 
         :param bool active: whether the LMIShell's cache should be used
         '''
         if hasattr(self.client, 'cache'):
             self.client.cache.active = active
 
+    def set_batch_size(self, initial=enum.MAX_OBJECT_CNT,
+                       minimum=enum.MAX_OBJECT_CNT_MIN,
+                       maximum=enum.MAX_OBJECT_CNT_MAX, adaptive=True):
+        '''
+        Sets MaxObjectCnt used by pull operations of this connection. The
+        controlled batch size is shared by all enumerations of the connection.
+
+        :param int initial: batch size of the first request
+        :param int minimum: minimum batch size
+        :param int maximum: maximum batch size
+        :param bool adaptive: whether to adapt the batch size to response
+            times; if False, initial batch size is always used
+        '''
+        self.client.batch_controller = enum.BatchSizeController(
+            initial, minimum, maximum, adaptive=adaptive)
+
+    def use_instance_cache(self, classnames, listener, destination=None,
+                           cache=None):
+        '''
+        Starts caching instances of classes returned by GetInstance (used by
+        :py:meth:`.LMIInstanceName.to_instance` and
+        :py:meth:`.LMIInstance.refresh`). The cache is kept consistent by
+        life-cycle indications delivered to listener.
+
+        :param classnames: names of classes, whose instances are cached
+        :param listener: :py:class:`wbem.CIMIndicationListener` object
+        :param string destination: URL of the listener as seen by CIMOM
+        :param InstanceCache cache: instance cache to use
+        '''
+        self.stop_instance_cache()
+        subscription = ind.LMIInstanceCacheSubscription(
+            self.client, classnames, listener, destination, cache)
+        subscription.start()
+        self.instance_cache_subscription = subscription
+
+    def stop_instance_cache(self):
+        '''
+        Stops caching instances and deletes the indication subscriptions.
+        '''
+        if self.instance_cache_subscription is not None:
+            self.instance_cache_subscription.stop()
+            self.instance_cache_subscription = None
+
+    def client_pool(self, size=pool.DEFAULT_POOL_SIZE,
+                    idle_timeout=pool.DEFAULT_IDLE_TIMEOUT):
+        '''
+        Returns a pool of additional clients connected to the same CIMOM,
+        which are used by concurrent operations. The pool is created on first
+        call; later calls can only grow it. Pool metrics are available as
+        :py:attr:`.ClientPool.stats`; connections and requests there include
+        the connection's main client.
+
+        :param int size: maximum number of pooled clients
+        :param float idle_timeout: seconds, after which idle pooled clients
+            are disconnected
+        '''
+        if not hasattr(self.client, 'clone'):
+            raise NotImplementedError(
+                '%s doesn\'t support concurrent operations' %
+                self.client.__class__.__name__)
+
+        if self.pool is None:
+            def make_client():
+                client = self.client.clone()
+                client.connect()
+                return client
+            self.pool = pool.ClientPool(
+                make_client, size, idle_timeout, self.client.counter)
+        elif self.pool.size < size:
+            self.pool.size = size
+        return self.pool
+
+    def async_client(self, size=pool.DEFAULT_POOL_SIZE, executor=None):
+        '''
+        Returns a new :py:class:`.AsyncClient`, which runs operations on the
+        connection's client pool.
+
+        :param int size: maximum number of pooled clients
+        :param executor: :py:class:`multiprocessing.pool.ThreadPool` object
+            shared with other asynchronous clients
+        '''
+        return core.AsyncClient(self.client_pool(size), executor)
+
+    def get_instances(self, inst_names, strategy=None,
+                      workers=pool.DEFAULT_POOL_SIZE, PropertyList=None):
+        '''
+        Returns a list of :py:class:`.LMIInstance` objects for a list of
+        :py:class:`.LMIInstanceName` objects, in the same order; None stands
+        for instances, which don't exist. See :py:func:`.bulk.get_instances`.
+        '''
+        return bulk.get_instances(
+            self, inst_names, strategy, workers, PropertyList)
+
+    def modify_instances(self, instances, workers=pool.DEFAULT_POOL_SIZE,
+                         stop_on_error=False):
+        '''
+        Pushes modified properties of many :py:class:`.LMIInstance` objects
+        concurrently and reports outcome per instance. See
+        :py:func:`.bulk.modify_instances`.
+
+        :returns: list of :py:class:`.LMIBulkResult` objects
+        '''
+        return bulk.modify_instances(self, instances, workers, stop_on_error)
+
+    def delete_instances(self, objects, workers=pool.DEFAULT_POOL_SIZE,
+                         stop_on_error=False):
+        '''
+        Deletes many :py:class:`.LMIInstance` or :py:class:`.LMIInstanceName`
+        objects concurrently and reports outcome per object. See
+        :py:func:`.bulk.delete_instances`.
+
+        :returns: list of :py:class:`.LMIBulkResult` objects
+        '''
+        return bulk.delete_instances(self, objects, workers, stop_on_error)
+
+    def push_instances(self, instances, workers=pool.DEFAULT_POOL_SIZE):
+        '''
+        Pushes modified properties of many :py:class:`.LMIInstance` objects
+        concurrently; unmodified ones are skipped. See
+        :py:func:`.bulk.push_instances`.
+
+        :returns: number of modified instances
+        '''
+        return bulk.push_instances(self, instances, workers)
+
     def connect(self):
         '''
         Connects to CIMOM and verifies credentials.
         '''
         self.client.connect()
         self.client.verify_connection()
+        if self.share_schema and hasattr(self.client, 'share_schema'):
+            fingerprint = self.share_schema
+            if fingerprint is True:
+                fingerprint = None
+            self.client.share_schema(fingerprint)
 
     def disconnect(self):
         '''
         Disconnects from CIMOM.
         '''
+        self.stop_instance_cache()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
         self.client.disconnect()
 
     def is_wsman(self):
@@ -1,3 +1,7 @@
 import wbem
+from asyncclient import AsyncClient
+from cache import Cache, InstanceCache
 from cimxml import CIMXMLClient
+from pool import ClientPool
+from schema import SchemaStore
 from wsman import WSMANClient
@@ -0,0 +1,140 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from multiprocessing.pool import ThreadPool
+
+from lmi.shell.core import enum
+
+
+class AsyncClient(object):
+    '''
+    Asynchronous facade over blocking clients. Operations are run by a thread
+    pool executor on clients from a :py:class:`.ClientPool` and return
+    :py:class:`multiprocessing.pool.AsyncResult` objects; result's get()
+    returns the operation's result, or raises its error. If callback is
+    passed, it is called with the result in executor's thread, before the
+    result is ready; its error is raised by get() as well.
+
+    The wbem backends offer only blocking calls, so every operation in
+    progress occupies one executor thread. Clients of many CIMOMs can share
+    one executor, which bounds the number of threads regardless of the number
+    of CIMOMs; operations over the bound wait in executor's queue.
+
+    Example of usage:
+
+        aclient = AsyncClient(conn.client_pool())
+        res = aclient.GetInstance(inst_name)
+        ...
+        cim_inst = res.get()
+
+    :param client_pool: :py:class:`.ClientPool` object
+    :param executor: :py:class:`multiprocessing.pool.ThreadPool` object; if
+        None, a private one with as many threads as the pool's size is used
+    '''
+    def __init__(self, client_pool, executor=None):
+        self.client_pool = client_pool
+        self.own_executor = executor is None
+        if executor is None:
+            executor = ThreadPool(client_pool.size)
+        self.executor = executor
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, repr(self.client_pool))
+
+    def call(self, method_name, args=(), kwargs=None, callback=None):
+        '''
+        Runs client's method asynchronously.
+
+        :param string method_name: name of client's method
+        :param callback: callable called with the result
+        :returns: :py:class:`multiprocessing.pool.AsyncResult` object
+        '''
+        def run():
+            with self.client_pool.client() as client:
+                result = getattr(client, method_name)(
+                    *args, **(kwargs or {}))
+            # Errors raised in executor's result handler would stop it, so
+            # the callback is called here and its errors go to the result.
+            if callback is not None:
+                callback(result)
+            return result
+        return self.executor.apply_async(run)
+
+    def GetClass(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('GetClass', args, kwargs, callback)
+
+    def GetInstance(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('GetInstance', args, kwargs, callback)
+
+    def InvokeMethod(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('InvokeMethod', args, kwargs, callback)
+
+    def OpenEnumerateInstances(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('OpenEnumerateInstances', args, kwargs, callback)
+
+    def OpenEnumerateInstanceNames(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('OpenEnumerateInstanceNames', args, kwargs, callback)
+
+    def PullInstances(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('PullInstances', args, kwargs, callback)
+
+    def PullInstanceNames(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('PullInstanceNames', args, kwargs, callback)
+
+    def CloseEnumeration(self, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self.call('CloseEnumeration', args, kwargs, callback)
+
+    def enumerate(self, op, callback):
+        '''
+        Runs an enumeration operation asynchronously; callback is called with
+        every received batch of elements. If callback returns False, the
+        enumeration is closed.
+
+        :param op: :py:class:`.OPBase` object
+        :returns: :py:class:`multiprocessing.pool.AsyncResult` object, which
+            is ready, when the enumeration finishes; its result is number of
+            received elements
+        '''
+        def run():
+            cnt = 0
+            with self.client_pool.client() as client:
+                try:
+                    while not op.finished():
+                        elements = op(client)
+                        cnt += len(elements)
+                        if callback(elements) is False:
+                            break
+                finally:
+                    op.close(client)
+            return cnt
+
+        enum.Enumerator(None).validate_operation(op)
+        return self.executor.apply_async(run)
+
+    def close(self):
+        '''
+        Waits for pending operations and stops the private executor.
+        '''
+        if self.own_executor:
+            self.executor.close()
+            self.executor.join()
@@ -2,8 +2,8 @@ from abc import abstractmethod
 from lmi.shell.core.cache import CacheBase
 
 class ClientBase(CacheBase):
-    def __init__(self):
-        super(ClientBase, self).__init__()
+    def __init__(self, cache=None, scope=None):
+        super(ClientBase, self).__init__(cache, scope)
 
     @abstractmethod
     def verify_connection(self):
@@ -13,26 +13,336 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import inspect
+import sys
+import threading
+import time
+import weakref
+from collections import namedtuple
 from functools import wraps
-from lmi.shell import util
 
 
-class Cache(dict):
+# Default limits of a cache. None means unlimited.
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = None
+DEFAULT_TTL = None
+
+CacheStats = namedtuple(
+    'CacheStats',
+    ['hits', 'misses', 'evictions', 'expirations', 'entries', 'bytes'])
+
+
+# Fields of a cache entry. Entries are stored in a circular doubly linked list
+# in LRU order; the least recently used entry follows the root.
+_PREV, _NEXT, _KEY, _VALUE, _EXPIRES, _SIZE = range(6)
+
+
+class Cache(object):
     '''
-    Cache class.
+    Cache engine with LRU eviction.
+
+    :param int max_entries: maximum number of entries; None means unlimited
+    :param int max_bytes: maximum estimated size of all values in bytes; None
+        means unlimited
+    :param float ttl: default time to live of an entry in seconds; None means
+        entries never expire
+    :param sizeof: callable, which estimates size of a cached value in bytes
     '''
-    def __init__(self, *args, **kwargs):
-        super(Cache, self).__init__(*args, **kwargs)
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL,
+                 sizeof=sys.getsizeof):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
         self.active = True
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None, None, 0]
+        self.bytes = 0
+        self.reset_stats()
 
-    def __setitem__(self, name, value):
-        if not self.active:
-            return
-        dict.__setitem__(self, name, value)
+    def __contains__(self, key):
+        with self.lock:
+            return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        with self.lock:
+            link = self._lookup(key)
+            if link is None:
+                raise KeyError(key)
+            return link[_VALUE]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            self._remove(self.entries[key])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.keys())
 
     def __repr__(self):
         return '%s(elements=%d)' % (self.__class__.__name__, len(self))
 
+    def _lookup(self, key):
+        '''
+        Returns a live entry for key and marks it as recently used; None, if
+        there is no such entry.
+        '''
+        link = self.entries.get(key)
+        if link is None:
+            return None
+        expires = link[_EXPIRES]
+        if expires is not None and expires <= time.time():
+            self._remove(link)
+            self.expirations += 1
+            return None
+        # Move the entry to the end of LRU order.
+        link_prev, link_next = link[_PREV], link[_NEXT]
+        link_prev[_NEXT] = link_next
+        link_next[_PREV] = link_prev
+        root = self.root
+        last = root[_PREV]
+        last[_NEXT] = root[_PREV] = link
+        link[_PREV] = last
+        link[_NEXT] = root
+        return link
+
+    def _remove(self, link):
+        link_prev, link_next = link[_PREV], link[_NEXT]
+        link_prev[_NEXT] = link_next
+        link_next[_PREV] = link_prev
+        del self.entries[link[_KEY]]
+        self.bytes -= link[_SIZE]
+        return link
+
+    def _shrink(self):
+        '''
+        Evicts least recently used entries until the cache fits its limits.
+        '''
+        def over_limits():
+            if self.max_entries is not None and \
+                    len(self.entries) > self.max_entries:
+                return True
+            if self.max_bytes is not None and self.bytes > self.max_bytes:
+                return True
+            return False
+
+        while self.entries and over_limits():
+            self._remove(self.root[_NEXT])
+            self.evictions += 1
+
+    def keys(self):
+        '''
+        Returns a list of keys in LRU order; the least recently used first.
+        '''
+        with self.lock:
+            keys = []
+            link = self.root[_NEXT]
+            while link is not self.root:
+                keys.append(link[_KEY])
+                link = link[_NEXT]
+            return keys
+
+    def get(self, key, default=None):
+        '''
+        Returns a cached value; default, if there is no such value. Hits and
+        misses are counted only by this method.
+        '''
+        with self.lock:
+            link = self._lookup(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return link[_VALUE]
+
+    def set(self, key, value, ttl=None):
+        '''
+        Stores a value in the cache.
+
+        :param key: hashable key
+        :param value: value to store
+        :param float ttl: time to live in seconds; if None, the cache's
+            default is used
+        '''
+        if not self.active:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self.lock:
+            if key in self.entries:
+                self._remove(self.entries[key])
+            root = self.root
+            last = root[_PREV]
+            link = [last, root, key, value, expires, size]
+            last[_NEXT] = root[_PREV] = self.entries[key] = link
+            self.bytes += size
+            self._shrink()
+
+    def pop(self, key, default=None):
+        '''
+        Removes a value from the cache and returns it.
+        '''
+        with self.lock:
+            if key not in self.entries:
+                return default
+            return self._remove(self.entries[key])[_VALUE]
+
+    def clear(self):
+        '''
+        Removes all the entries from the cache.
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.root[:] = [self.root, self.root, None, None, None, 0]
+            self.bytes = 0
+
+    def purge(self):
+        '''
+        Removes all the expired entries from the cache.
+        '''
+        now = time.time()
+        with self.lock:
+            for link in self.entries.values():
+                expires = link[_EXPIRES]
+                if expires is not None and expires <= now:
+                    self._remove(link)
+                    self.expirations += 1
+
+    def reset_stats(self):
+        '''
+        Resets hit/miss/eviction counters.
+        '''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def stats(self):
+        '''
+        Returns :py:class:`CacheStats` with cache counters.
+        '''
+        return CacheStats(
+            self.hits, self.misses, self.evictions, self.expirations,
+            len(self.entries), self.bytes)
+
+
+def path_key(path, namespace=None):
+    '''
+    Returns a hashable, case-insensitive key of an instance path. Host part
+    of the path is ignored; namespace is used, if the path has none.
+    '''
+    namespace = path.namespace or namespace
+    def value_key(value):
+        if hasattr(value, 'keybindings'):
+            return path_key(value)
+        elif isinstance(value, list):
+            return tuple(value_key(v) for v in value)
+        return value
+
+    return (
+        namespace and nocase_name(namespace),
+        nocase_name(path.classname),
+        frozenset(
+            (nocase_name(k), value_key(v))
+            for k, v in path.keybindings.iteritems()))
+
+
+class InstanceCache(Cache):
+    '''
+    Cache of CIM instances keyed by their paths. Cached instances are copied
+    both when stored and returned, so callers can modify them freely.
+
+    The cache doesn't know, when instances change on CIMOM; it must be fed
+    with indications by :py:meth:`handle_indication`, or used with a short
+    ttl.
+    '''
+    # Kinds of indications handled by the cache.
+    IND_CREATION = 'CIM_InstCreation'
+    IND_MODIFICATION = 'CIM_InstModification'
+    IND_DELETION = 'CIM_InstDeletion'
+
+    def get_instance(self, path):
+        '''
+        Returns a copy of a cached instance; None, if there is no such
+        instance.
+        '''
+        inst = self.get(path_key(path))
+        return inst.copy() if inst is not None else None
+
+    def set_instance(self, inst, path=None):
+        '''
+        Stores a copy of an instance.
+        '''
+        path = path if path is not None else inst.path
+        self.set(path_key(path), inst.copy())
+
+    def invalidate(self, path):
+        '''
+        Removes an instance from the cache.
+        '''
+        self.pop(path_key(path))
+
+    def invalidate_class(self, classname):
+        '''
+        Removes all the instances of a class from the cache.
+        '''
+        classname = nocase_name(classname)
+        with self.lock:
+            for key, link in self.entries.items():
+                if key[1] == classname:
+                    self._remove(link)
+
+    def handle_indication(self, indication, kind, namespace=None):
+        '''
+        Updates the cache according to received life-cycle indication.
+        Modified instances are refreshed, created and deleted instances are
+        removed. If the indication's SourceInstance has no path, all the
+        instances of its class are removed.
+
+        :param indication: received indication (CIM instance)
+        :param string kind: one of IND_CREATION, IND_MODIFICATION,
+            IND_DELETION
+        :param string namespace: namespace of SourceInstance, if its path has
+            none
+        '''
+        if indication is None or 'SourceInstance' not in indication:
+            return
+        source = indication['SourceInstance']
+        if source is None:
+            return
+
+        if source.path is None or not source.path.keybindings:
+            self.invalidate_class(source.classname)
+            return
+
+        key = path_key(source.path, namespace)
+        if kind == self.IND_MODIFICATION:
+            with self.lock:
+                link = self._lookup(key)
+                if link is not None:
+                    # Keep the path of the cached instance, the one from
+                    # indication may lack namespace or host.
+                    inst = source.copy()
+                    inst.path = link[_VALUE].path
+                    size = 0
+                    if self.max_bytes is not None:
+                        size = self.sizeof(inst)
+                    self.bytes += size - link[_SIZE]
+                    link[_VALUE] = inst
+                    link[_SIZE] = size
+        else:
+            self.pop(key)
+
 
 class GCache(Cache):
     '''
@@ -40,37 +350,209 @@ class GCache(Cache):
     '''
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
-            cls._instance = super(Cache, cls).__new__(cls)
+            cls._instance = super(GCache, cls).__new__(cls)
+            Cache.__init__(cls._instance, *args, **kwargs)
         return cls._instance
 
+    def __init__(self, *args, **kwargs):
+        # The singleton is initialized only once in __new__().
+        pass
+
 
 class CacheBase(object):
     '''
     Cached object base class.
+
+    :param Cache cache: cache engine to use; if None, a new :py:class:`Cache`
+        with default limits is created
+    :param scope: hashable identity of the object's data source (such as
+        CIMOM's URL); an engine passed to several objects keeps their
+        entries apart by it
+    '''
+    def __init__(self, cache=None, scope=None):
+        self.cache = cache if cache is not None else Cache()
+        self.cache_scope = scope
+        # Cache for schema objects. It is the same as self.cache, unless the
+        # object shares schema objects with others; see shared_cache().
+        self.schema_cache = self.cache
+
+
+# Caches shared among several objects. A cache is dropped, when there is no
+# object using it.
+_SHARED_CACHES = weakref.WeakValueDictionary()
+_SHARED_CACHES_LOCK = threading.Lock()
+
+
+def shared_cache(key, factory=Cache):
+    '''
+    Returns a cache shared by all callers, which use the same key. If there is
+    no such cache, a new one is created by factory().
+    '''
+    with _SHARED_CACHES_LOCK:
+        cache = _SHARED_CACHES.get(key)
+        if cache is None:
+            cache = factory()
+            _SHARED_CACHES[key] = cache
+        return cache
+
+
+# Marker of a required argument, which has not been passed.
+_REQUIRED = object()
+
+# Case-insensitive names (class names, namespaces) mapped to their lower-case
+# form. Shared by all key makers, so each name is lowered only once.
+_NOCASE_NAMES = {}
+_NOCASE_NAMES_MAX = 65536
+
+
+def nocase_name(name):
     '''
-    def __init__(self):
-        self.cache = Cache()
+    Returns an interned lower-case form of a CIM name.
+    '''
+    try:
+        return _NOCASE_NAMES[name]
+    except KeyError:
+        if len(_NOCASE_NAMES) >= _NOCASE_NAMES_MAX:
+            _NOCASE_NAMES.clear()
+        lower = name.lower()
+        # Keep just one object for every spelling of the name.
+        lower = _NOCASE_NAMES.setdefault(lower, lower)
+        _NOCASE_NAMES[name] = lower
+        return lower
+
+
+def freeze(value):
+    '''
+    Returns a hashable equivalent of a list, set or dict value.
+    '''
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.iteritems()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    return value
+
+
+class KeyMaker(object):
+    '''
+    Builds cache keys for calls of a function. Positional and keyword
+    arguments are normalized into one tuple of argument values in the order
+    of function's signature, so f(1, b=2) and f(1, 2) share one key. The key
+    starts with the function's name, so methods can share one cache.
+
+    :param func: function, for which the keys are built
+    :param nocase: names of arguments, which are compared case-insensitively
+    '''
+    def __init__(self, func, nocase=()):
+        spec = inspect.getargspec(func)
+        self.name = func.__name__
+        self.generic = spec.varargs is not None or spec.keywords is not None
+
+        # Default value for each positional argument. Required arguments get
+        # a marker, which doesn't match any real value.
+        defaults = spec.defaults or ()
+        required = len(spec.args) - len(defaults)
+        self.defaults = (_REQUIRED,) * required + tuple(defaults)
+        self.index = dict((name, i) for i, name in enumerate(spec.args))
+        self.nocase = tuple(
+            i for i, name in enumerate(spec.args) if name in nocase)
+
+    def __call__(self, args, kwargs, skip=0, scope=None):
+        '''
+        Returns a hashable key for a call with args and kwargs. First skip
+        positional arguments (such as self) are not part of the key; scope,
+        if not None, is.
+        '''
+        prefix = (self.name,) if scope is None else (scope, self.name)
+        if self.generic:
+            return prefix + freeze(args[skip:]) + freeze(kwargs)
+
+        values = list(args + self.defaults[len(args):])
+        if kwargs:
+            index = self.index
+            try:
+                for name, value in kwargs.iteritems():
+                    values[index[name]] = value
+            except KeyError as e:
+                raise TypeError(
+                    '%s() got an unexpected keyword argument \'%s\'' % (
+                        self.name, e.args[0]))
+
+        for i in self.nocase:
+            value = values[i]
+            if isinstance(value, basestring):
+                values[i] = nocase_name(value)
+
+        values[0:skip] = prefix
+        key = tuple(values)
+        try:
+            hash(key)
+        except TypeError:
+            # Unhashable arguments, such as PropertyList.
+            key = freeze(key)
+        return key
+
+
+class _NegativeResult(object):
+    '''
+    Cached exception raised by a function call.
+    '''
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
 
 
 # Decorator used for caching a function or method call. When used with methods,
-# a class must derive from CacheBase.
-def cached(func):
-    saved = None
+# a class must derive from CacheBase.  It can be used either as @cached, or as
+# @cached(...) with following keyword arguments:
+#
+# nocase       -- names of case-insensitive arguments
+# cache        -- name of CacheBase's member holding the cache to use
+# negative     -- predicate, which tells if a raised exception should be cached;
+#                 cached exceptions are raised again on following calls
+# negative_ttl -- time to live of cached exceptions in seconds
+def cached(func=None, nocase=(), cache='cache', negative=None,
+           negative_ttl=None):
+    if func is None:
+        return lambda func: cached(
+            func, nocase, cache, negative, negative_ttl)
+
+    make_key = KeyMaker(func, nocase)
+    missing = object()
 
     @wraps(func)
     def wrapped(*args, **kwargs):
-        # Choose a cache to use.
-        if len(args) >= 1 and isinstance(args[0], CacheBase):
-            saved = args[0].cache
+        # Choose a cache to use. Per-object caches don't need the object to
+        # be a part of the key, just its scope: one engine can be passed to
+        # several objects. Schema caches shared by fingerprint are shared on
+        # purpose; they are bypassed, while the object's own cache is
+        # inactive.
+        if args and isinstance(args[0], CacheBase):
+            obj = args[0]
+            saved = getattr(obj, cache)
+            if saved is not obj.cache and not obj.cache.active:
+                saved = obj.cache
+            scope = obj.cache_scope if saved is obj.cache else None
+            k = make_key(args, kwargs, 1, scope)
         else:
             saved = GCache()
+            k = make_key(args, kwargs)
 
-        k = args + util.flatten(kwargs)
-        if k in saved:
-            return saved[k]
-        result = func(*args, **kwargs)
+        result = saved.get(k, missing)
+        if result is not missing:
+            if result.__class__ is _NegativeResult:
+                raise result.error
+            return result
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if negative is not None and negative(e):
+                saved.set(k, _NegativeResult(e), negative_ttl)
+            raise
         saved[k] = result
         return result
     return wrapped
@@ -1,15 +1,90 @@
+import hashlib
 from lmi.shell import exc, util
-from lmi.shell.core import base, wbem
-from lmi.shell.core.cache import cached
+from lmi.shell.core import base, pool, wbem
+from lmi.shell.core.cache import cached, shared_cache
+
+
+# Time to live of cached GetClass() errors for missing classes (seconds).
+NEGATIVE_CACHE_TTL = 30
+
+# CIM operations; each sends one request to CIMOM.
+OPERATIONS = (
+    'GetClass', 'EnumerateClasses', 'EnumerateClassNames',
+    'GetInstance', 'EnumerateInstances', 'EnumerateInstanceNames',
+    'CreateInstance', 'ModifyInstance', 'DeleteInstance',
+    'Associators', 'AssociatorNames', 'References', 'ReferenceNames',
+    'InvokeMethod', 'ExecQuery',
+    'OpenEnumerateInstances', 'OpenEnumerateInstanceNames',
+    'OpenAssociatorInstances', 'OpenAssociatorInstanceNames',
+    'OpenReferenceInstances', 'OpenReferenceInstanceNames', 'OpenExecQuery',
+    'PullInstances', 'PullInstanceNames', 'PullInstancesWithPath',
+    'CloseEnumeration',
+    'GetQualifier', 'EnumerateQualifiers')
+
+
+def _counted(name):
+    '''
+    Returns a method, which counts a request sent by operation name.
+    '''
+    operation = getattr(wbem.WBEMConnection, name)
+
+    def method(self, *args, **kwargs):
+        self.counter.sent()
+        return operation(self, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+def is_missing_class(e):
+    '''
+    Returns True, if e is a CIM error saying, that a class doesn't exist.
+    Errors raised by other client methods are already wrapped in
+    :py:exc:`.CIMError`.
+    '''
+    return isinstance(e, (wbem.CIMError, exc.CIMError)) and \
+        e.args[0] in (wbem.CIM_ERR_NOT_FOUND, wbem.CIM_ERR_INVALID_CLASS)
+
+
+class _CountedConnection(wbem.WBEMConnection):
+    '''
+    :py:class:`wbem.WBEMConnection`, which counts connections opened and
+    requests sent in its counter; calls bypassing client's caches go here.
+    '''
+    def connect(self, *args, **kwargs):
+        rval = wbem.WBEMConnection.connect(self, *args, **kwargs)
+        self.counter.connected()
+        return rval
+
+for _name in OPERATIONS:
+    if hasattr(wbem.WBEMConnection, _name):
+        setattr(_CountedConnection, _name, _counted(_name))
 
 
 @exc.cwrap
-class CIMXMLClient(base.ClientBase, wbem.WBEMConnection):
+class CIMXMLClient(base.ClientBase, _CountedConnection):
     '''
     CIM-XML Client.
+
+    If schema_store (:py:class:`.SchemaStore`) is provided, schema calls
+    (GetClass, EnumerateClasses, EnumerateClassNames) are answered from the
+    on-disk store first. Stored objects are valid for a schema version, which
+    is either passed in as schema_version, or the schema fingerprint read from
+    CIMOM once per namespace; see :py:meth:`schema_version`.
+
+    Clients connected to CIMOMs with identical schema can share schema objects
+    in one cache; see :py:meth:`share_schema`.
+
+    If instance_cache (:py:class:`.InstanceCache`) is set, GetInstance calls
+    with default arguments are served from it. ModifyInstance and
+    DeleteInstance evict affected instances; other changes must be reported to
+    the cache by indications, see :py:class:`.LMIInstanceCacheSubscription`.
+
+    Connections opened and requests sent are counted in counter
+    (:py:class:`.TransportCounter`), which is shared with clones.
     '''
     def __init__(self, uri, username='', password='', key_file=None,
-            cert_file=None, verify_server_cert=True, use_cache=True):
+            cert_file=None, verify_server_cert=True, use_cache=True,
+            cache=None, schema_store=None, schema_version=None):
         creds = (username, password)
         x509 = {'cert_file': cert_file, 'key_file': key_file}
         if util.is_negative(creds) is True:
@@ -17,45 +92,220 @@ class CIMXMLClient(base.ClientBase, wbem.WBEMConnection):
         if util.is_negative(x509) is True:
             x509 = None
 
-        base.ClientBase.__init__(self)
+        # Arguments needed to open another connection to the same CIMOM.
+        self.clone_args = (
+            uri, username, password, key_file, cert_file, verify_server_cert,
+            use_cache)
+        self.counter = pool.TransportCounter()
+
+        # Entries of a cache engine shared with other connections are kept
+        # apart by CIMOM and user.
+        base.ClientBase.__init__(self, cache, scope=(uri, username))
         wbem.WBEMConnection.__init__(
             self, uri, creds, x509,
             no_verification=not verify_server_cert)
 
         self.use_cache = use_cache
         self.supports_pull = wbem.config.SUPPORTS_PULL_OPERATIONS
+        # Instance filters are passed to CIMOM as FilterQuery of pull
+        # operations, or as ExecQuery; cleared, when CIMOM refuses them.
+        self.supports_filter_query = True
+        self.supports_exec_query = True
+        self.schema_store = schema_store
+        self.schema_versions = {}
+        self.schema_fingerprints = {}
+        self.fixed_schema_version = schema_version
+        self.instance_cache = None
+        # Batch size controller shared by pull operations; None means every
+        # enumeration adapts its own batch size.
+        self.batch_controller = None
 
     def __repr__(self):
         return u'%s(url=%s, ...)' % (self.__class__.__name__, repr(self.url))
 
+    def clone(self):
+        '''
+        Returns a new, not yet connected client with the same CIMOM and
+        options. The clients share caches, so the new one doesn't fetch
+        schema again.
+        '''
+        client = CIMXMLClient(
+            *self.clone_args, cache=self.cache,
+            schema_store=self.schema_store,
+            schema_version=self.fixed_schema_version)
+        client.schema_cache = self.schema_cache
+        client.schema_versions = self.schema_versions
+        client.schema_fingerprints = self.schema_fingerprints
+        client.instance_cache = self.instance_cache
+        client.batch_controller = self.batch_controller
+        client.supports_pull = self.supports_pull
+        client.supports_filter_query = self.supports_filter_query
+        client.supports_exec_query = self.supports_exec_query
+        client.counter = self.counter
+        return client
+
     def verify_connection(self):
         try:
-            # This should raise CIMError.
-            self.GetClass('RaiseCIMErrorClass')
-        except exc.CIMError as e:
+            # This should raise CIMError. Bypass the cache; cached error
+            # doesn't prove the connection is working.
+            _CountedConnection.GetClass(self, 'RaiseCIMErrorClass')
+        except wbem.CIMError as e:
             # Yes, we are good. Connection is working.
             return
 
-    @cached
+    def schema_version(self, namespace=None):
+        '''
+        Returns version of the schema used in namespace, which keys objects in
+        the on-disk schema store; None, if it can't be determined. Unless
+        schema_version was passed in, it is the schema fingerprint, so it
+        changes, whenever providers add or remove classes; stored objects of
+        other versions are then dropped.
+        '''
+        if self.fixed_schema_version is not None:
+            return self.fixed_schema_version
+
+        namespace = namespace or wbem.config.DEFAULT_NAMESPACE
+        if namespace not in self.schema_versions:
+            try:
+                version = self.schema_fingerprint(namespace)
+            except (wbem.CIMError, exc.CIMError):
+                version = None
+            if version is not None and self.schema_store is not None:
+                self.schema_store.retain(self.url, namespace, version)
+            self.schema_versions[namespace] = version
+        return self.schema_versions[namespace]
+
+    def dmtf_version(self, namespace=None):
+        '''
+        Returns version of the DMTF CIM schema used in namespace; None, if it
+        can't be determined.
+        '''
+        try:
+            cim_class = _CountedConnection.GetClass(
+                self, 'CIM_ManagedElement', namespace, LocalOnly=True,
+                IncludeQualifiers=True)
+            return cim_class.qualifiers['Version'].value
+        except (wbem.CIMError, KeyError):
+            return None
+
+    def schema_fingerprint(self, namespace=None):
+        '''
+        Returns a fingerprint of CIMOM's schema in namespace; a digest of the
+        DMTF schema version and of all class names. CIMOMs running the same
+        provider build have the same fingerprint. Computed once per namespace.
+        '''
+        namespace = namespace or wbem.config.DEFAULT_NAMESPACE
+        if namespace not in self.schema_fingerprints:
+            classnames = _CountedConnection.EnumerateClassNames(
+                self, namespace, None, True)
+
+            digest = hashlib.sha1(repr(self.dmtf_version(namespace)))
+            for classname in sorted(c.lower() for c in classnames):
+                digest.update('\0' + classname.encode('utf-8'))
+            self.schema_fingerprints[namespace] = digest.hexdigest()
+        return self.schema_fingerprints[namespace]
+
+    def share_schema(self, fingerprint=None):
+        '''
+        Starts using a schema cache shared with all clients, which share
+        schema with the same fingerprint. If fingerprint is None, it is
+        computed by :py:meth:`schema_fingerprint`.
+        '''
+        if fingerprint is None:
+            fingerprint = self.schema_fingerprint()
+        self.schema_cache = shared_cache(('schema', fingerprint))
+
+    def unshare_schema(self):
+        '''
+        Stops using a shared schema cache.
+        '''
+        self.schema_cache = self.cache
+
+    def schema_call(self, namespace, key, fetch):
+        '''
+        Returns a schema object identified by key from the on-disk schema
+        store. If the object is not stored, yet, fetch() is called and its
+        result is stored.
+        '''
+        if self.schema_store is None:
+            return fetch()
+
+        namespace = namespace or wbem.config.DEFAULT_NAMESPACE
+        version = self.schema_version(namespace)
+        if version is None:
+            return fetch()
+
+        value = self.schema_store.get(self.url, namespace, version, key)
+        if value is None:
+            value = fetch()
+            self.schema_store.set(self.url, namespace, version, key, value)
+        return value
+
+    @cached(nocase=('ClassName', 'namespace'), cache='schema_cache',
+            negative=is_missing_class, negative_ttl=NEGATIVE_CACHE_TTL)
     def EnumerateClasses(self, namespace=None, ClassName=None,
                          DeepInheritance=False, LocalOnly=True,
                          IncludeQualifiers=True, IncludeClassOrigin=False):
-        return wbem.WBEMConnection.EnumerateClasses(
-            self, namespace, ClassName, DeepInheritance, LocalOnly,
-            IncludeQualifiers, IncludeClassOrigin)
+        return self.schema_call(
+            namespace,
+            ('EnumerateClasses', ClassName and ClassName.lower(),
+             DeepInheritance, LocalOnly, IncludeQualifiers,
+             IncludeClassOrigin),
+            lambda: _CountedConnection.EnumerateClasses(
+                self, namespace, ClassName, DeepInheritance, LocalOnly,
+                IncludeQualifiers, IncludeClassOrigin))
 
-    @cached
+    @cached(nocase=('ClassName', 'namespace'), cache='schema_cache',
+            negative=is_missing_class, negative_ttl=NEGATIVE_CACHE_TTL)
     def EnumerateClassNames(self, namespace=None, ClassName=None,
                             DeepInheritance=False):
-        return wbem.WBEMConnection.EnumerateClassNames(
-            self, namespace, ClassName, DeepInheritance)
+        return self.schema_call(
+            namespace,
+            ('EnumerateClassNames', ClassName and ClassName.lower(),
+             DeepInheritance),
+            lambda: _CountedConnection.EnumerateClassNames(
+                self, namespace, ClassName, DeepInheritance))
 
-    @cached
+    @cached(nocase=('ClassName', 'namespace'), cache='schema_cache',
+            negative=is_missing_class, negative_ttl=NEGATIVE_CACHE_TTL)
     def GetClass(self, ClassName, namespace=None, LocalOnly=True,
                  IncludeQualifiers=True, IncludeClassOrigin=False,
                  PropertyList=None):
-        cim_class = wbem.WBEMConnection.GetClass(
-            self, ClassName, namespace, LocalOnly, IncludeQualifiers,
-            IncludeClassOrigin, PropertyList)
+        def fetch():
+            return _CountedConnection.GetClass(
+                self, ClassName, namespace, LocalOnly, IncludeQualifiers,
+                IncludeClassOrigin, PropertyList)
+
+        if PropertyList is None:
+            cim_class = self.schema_call(
+                namespace,
+                ('GetClass', ClassName.lower(), LocalOnly, IncludeQualifiers,
+                 IncludeClassOrigin),
+                fetch)
+        else:
+            cim_class = fetch()
         cim_class.namespace = namespace
         return cim_class
+
+    def GetInstance(self, InstanceName, *args, **kwargs):
+        if self.instance_cache is None or args or kwargs:
+            return _CountedConnection.GetInstance(
+                self, InstanceName, *args, **kwargs)
+
+        cim_inst = self.instance_cache.get_instance(InstanceName)
+        if cim_inst is None:
+            cim_inst = _CountedConnection.GetInstance(self, InstanceName)
+            self.instance_cache.set_instance(cim_inst, InstanceName)
+        return cim_inst
+
+    def ModifyInstance(self, ModifiedInstance, *args, **kwargs):
+        if self.instance_cache is not None:
+            self.instance_cache.invalidate(ModifiedInstance.path)
+        return _CountedConnection.ModifyInstance(
+            self, ModifiedInstance, *args, **kwargs)
+
+    def DeleteInstance(self, InstanceName, *args, **kwargs):
+        if self.instance_cache is not None:
+            self.instance_cache.invalidate(InstanceName)
+        return _CountedConnection.DeleteInstance(
+            self, InstanceName, *args, **kwargs)
@@ -1,15 +1,81 @@
+import Queue
+import sys
+import threading
+import time
 from abc import abstractmethod
 from lmi.shell import exc
+from lmi.shell.core import wbem
+from lmi.shell.logger import logger
 from lmi.shell.util import query
 
 
+# Default limits of MaxObjectCnt for pull operations.
 MAX_OBJECT_CNT = 16
+MAX_OBJECT_CNT_MIN = 1
+MAX_OBJECT_CNT_MAX = 4096
+
+# Desired duration of one pull request (seconds).
+BATCH_TARGET_TIME = 0.5
+
+
+class BatchSizeController(object):
+    '''
+    Controls MaxObjectCnt of pull operations. The batch size is adapted to
+    observed response times, so one request takes roughly target_time seconds;
+    per-object time grows with payload size, so wide objects get smaller
+    batches. The batch size can at most double or halve in one step.
+
+    :param int initial: batch size of the first request
+    :param int minimum: minimum batch size
+    :param int maximum: maximum batch size
+    :param float target_time: desired duration of one request in seconds
+    :param bool adaptive: if False, the batch size is always initial
+    '''
+    def __init__(self, initial=MAX_OBJECT_CNT, minimum=MAX_OBJECT_CNT_MIN,
+                 maximum=MAX_OBJECT_CNT_MAX, target_time=BATCH_TARGET_TIME,
+                 adaptive=True):
+        if not 0 < minimum <= initial <= maximum:
+            raise ValueError('must be 0 < minimum <= initial <= maximum')
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_time = target_time
+        self.adaptive = adaptive
+
+    def __repr__(self):
+        return '%s(size=%d, ...)' % (self.__class__.__name__, self.size)
+
+    def update(self, received, elapsed):
+        '''
+        Adapts the batch size after a request, which returned received
+        objects in elapsed seconds.
+        '''
+        if not self.adaptive or received <= 0 or elapsed <= 0:
+            return
+        ideal = int(self.target_time * received / elapsed)
+        size = max(self.size // 2, min(self.size * 2, ideal))
+        self.size = max(self.minimum, min(self.maximum, size))
+
+
+# Ways of evaluating an instance filter: FilterQuery of pull operations,
+# ExecQuery, or matching received objects on client side.
+FILTER_QUERY, FILTER_EXEC_QUERY, FILTER_CLIENT = range(3)
+
+# CIM errors meaning, that CIMOM can't evaluate a filter.
+FILTER_ERRORS = (
+    wbem.CIM_ERR_NOT_SUPPORTED,
+    wbem.CIM_ERR_QUERY_LANGUAGE_NOT_SUPPORTED,
+    wbem.CIM_ERR_INVALID_QUERY,
+    getattr(wbem, 'CIM_ERR_FILTERED_ENUMERATION_NOT_SUPPORTED', 25))
 
 
 class OPBase(object):
     '''
     Base class for Enumerator operations.
     '''
+    # True, if the operation's filter can be evaluated by CIMOM.
+    SUPPORTS_QUERY = False
+
     def __init__(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
@@ -18,44 +84,163 @@ class OPBase(object):
         self.cnt = 0
         self.limit = -1
         self.query = None
+        self.filter_mode = None
+        self.batch_controller = None
 
     def __call__(self, client):
-        if client.supports_pull:
-            method = self.make_method(client)
-            args, kwargs = self.make_method_args()
-
-            try:
-                # Get a batch of elements.
-                elements, self.ctx, self.end = method(*args, **kwargs)
-                self.cnt += len(elements)
+        if self.limit == 0:
+            self.end = True
+            return []
 
-                if self.limit >= 0 and self.cnt > self.limit:
-                    limit = self.limit - len(elements)
-                    self.end = True
-                    client.CloseEnumeration(self.ctx)
-                    return elements[:limit]
+        if self.query and self.filter_mode is None:
+            self.filter_mode = self.select_filter_mode(client)
 
-                return elements
-            except exc.CIMError as e:
-                if e.args[0] == wbem.CIM_ERR_NOT_SUPPORTED:
-                    client.supports_pull = False
-                    self.ctx = None
-                    self.end = True
-                else:
-                    raise
+        elements = self.filter_elements(self.fetch(client))
+        self.cnt += len(elements)
 
-        if not client.supports_pull:
-            method = self.make_method(client, False)
-            args, kwargs = self.make_method_args(False)
+        if self.limit >= 0 and self.cnt >= self.limit:
+            # Drop surplus elements; there can be some only if the filter is
+            # evaluated on client side, or CIMOM ignored MaxObjectCnt.
+            elements = elements[:len(elements) - (self.cnt - self.limit)]
+            self.cnt = self.limit
+            self.close(client)
+            self.end = True
 
-            # Get all the elements.
-            elements = method(*args, **kwargs)
+        return elements
 
-            # This type of call doesn't return end flag. We need to set this by
-            # hand.
-            self.end = True
+    def fetch(self, client):
+        '''
+        Returns next batch of elements received from CIMOM.
+        '''
+        if self.filter_mode == FILTER_EXEC_QUERY:
+            return self.exec_query(client)
 
+        if client.supports_pull:
+            try:
+                return self.pull(client)
+            except exc.CIMError as e:
+                if self.ctx is not None:
+                    raise
+                if self.filter_mode == FILTER_QUERY and \
+                        e.args[0] == wbem.CIM_ERR_NOT_SUPPORTED:
+                    # Either the filter, or pull operations are not
+                    # supported.
+                    return self.pull_unfiltered(client)
+                if self.filter_mode == FILTER_QUERY and \
+                        e.args[0] in FILTER_ERRORS:
+                    # CIMOM can't filter pull operations.
+                    client.supports_filter_query = False
+                    self.filter_mode = self.select_filter_mode(client)
+                    return self.fetch(client)
+                if e.args[0] != wbem.CIM_ERR_NOT_SUPPORTED:
+                    raise
+                client.supports_pull = False
+
+        method = self.make_method(client, False)
+        args, kwargs = self.make_method_args(False)
+
+        # Get all the elements.
+        elements = method(*args, **kwargs)
+
+        # This type of call doesn't return end flag. We need to set this by
+        # hand.
+        self.end = True
+
+        return elements
+
+    def pull(self, client):
+        '''
+        Returns a batch of elements received by a pull operation.
+        '''
+        controller = self.get_batch_controller(client)
+        max_object_cnt = controller.size
+        if self.limit >= 0 and self.filter_mode != FILTER_CLIENT:
+            # Don't transfer elements beyond the limit.
+            max_object_cnt = max(1, min(max_object_cnt, self.limit - self.cnt))
+
+        method = self.make_method(client)
+        args, kwargs = self.make_method_args(max_object_cnt=max_object_cnt)
+
+        start = time.time()
+        elements, self.ctx, self.end = method(*args, **kwargs)
+        controller.update(len(elements), time.time() - start)
+        return elements
+
+    def pull_unfiltered(self, client):
+        '''
+        Opens the pull operation, which refused the filter, again without the
+        filter; the filter is evaluated on client side. If CIMOM doesn't
+        support pull operations at all, a non-pull way is selected.
+        '''
+        self.filter_mode = FILTER_CLIENT
+        try:
+            elements = self.pull(client)
+        except exc.CIMError as e:
+            if self.ctx is not None or \
+                    e.args[0] != wbem.CIM_ERR_NOT_SUPPORTED:
+                raise
+            client.supports_pull = False
+            self.filter_mode = self.select_filter_mode(client)
+            return self.fetch(client)
+        client.supports_filter_query = False
+        return elements
+
+    def exec_query(self, client):
+        '''
+        Returns all the elements matching the filter received by ExecQuery.
+        CQL is tried first, then WQL.
+        '''
+        queries = (
+            (query.QUERY_TYPE_CQL, self.query.to_cql(self.classname)),
+            (query.QUERY_TYPE_WQL, self.query.to_wql(self.classname)))
+
+        for query_lang, query_str in queries:
+            try:
+                instances = client.ExecQuery(
+                    query_lang, query_str, self.namespace)
+                break
+            except exc.CIMError as e:
+                if e.args[0] not in FILTER_ERRORS:
+                    raise
+        else:
+            client.supports_exec_query = False
+            self.filter_mode = FILTER_CLIENT
+            return self.fetch(client)
+
+        self.end = True
+        return self.from_instances(instances)
+
+    def select_filter_mode(self, client):
+        '''
+        Returns the cheapest way of evaluating the filter, which client
+        supports.
+        '''
+        if self.SUPPORTS_QUERY and self.query.expressible:
+            if client.supports_pull and \
+                    getattr(client, 'supports_filter_query', False):
+                return FILTER_QUERY
+            if getattr(client, 'supports_exec_query', False) and \
+                    self.exec_query_equivalent():
+                return FILTER_EXEC_QUERY
+        return FILTER_CLIENT
+
+    def exec_query_equivalent(self):
+        '''
+        Returns True, if ExecQuery returns the same elements as the
+        operation.
+        '''
+        return True
+
+    def filter_elements(self, elements):
+        if self.filter_mode != FILTER_CLIENT:
             return elements
+        return [e for e in elements if self.query.match(e)]
+
+    def from_instances(self, instances):
+        '''
+        Converts instances returned by ExecQuery into operation's elements.
+        '''
+        return instances
 
     @classmethod
     def method_name(cls):
@@ -64,14 +249,42 @@ class OPBase(object):
     def finished(self):
         return self.end
 
-    def make_method_args(self, use_pull=True):
+    def close(self, client):
+        '''
+        Closes an unfinished pull enumeration.
+        '''
+        if self.ctx is not None and not self.end:
+            self.end = True
+            try:
+                client.CloseEnumeration(self.ctx)
+            except (exc.CIMError, exc.ConnectionError) as e:
+                # The context may already be invalid, if the enumeration
+                # failed. Don't mask the original error.
+                logger.debug('Can\'t close enumeration: %s', e)
+
+    def get_batch_controller(self, client):
+        '''
+        Returns a batch size controller; the operation's one, if set,
+        otherwise the client's one. If neither is set, a new adaptive
+        controller is used for this operation.
+        '''
+        if self.batch_controller is None:
+            controller = getattr(client, 'batch_controller', None)
+            self.batch_controller = controller or BatchSizeController()
+        return self.batch_controller
+
+    def make_method_args(self, use_pull=True, max_object_cnt=MAX_OBJECT_CNT):
         if use_pull:
             if self.ctx is None:
+                # Open call returns the first batch right away.
                 kwargs = self.kwargs.copy()
-                kwargs['MaxObjectCnt'] = 0
+                kwargs['MaxObjectCnt'] = max_object_cnt
+                if self.filter_mode == FILTER_QUERY:
+                    kwargs['FilterQueryLanguage'] = query.QUERY_TYPE_FQL
+                    kwargs['FilterQuery'] = self.query.to_fql()
                 return self.args, kwargs
             else:
-                return [self.ctx], {'MaxObjectCnt': MAX_OBJECT_CNT}
+                return [self.ctx], {'MaxObjectCnt': max_object_cnt}
         else:
             return self.args, self.kwargs
 
@@ -85,13 +298,31 @@ class OPBase(object):
         return getattr(client, method_name)
 
     def set_filter(self, inst_filter):
-        self.query = query.Query(inst_filter)
+        '''
+        Sets an instance filter; dictionary of property names and values.
+        Only elements having all the properties set to the values are
+        returned.
+        '''
+        self.query = query.Query(inst_filter) if inst_filter else None
+        self.filter_mode = None
 
     def set_limit(self, limit):
         if limit < -1:
             raise ValueError('limit out of range <-1, inf)')
         self.limit = limit
 
+    def set_batch_size(self, max_object_cnt=None, controller=None):
+        '''
+        Overrides MaxObjectCnt for this operation. Either a fixed batch size,
+        or a :py:class:`BatchSizeController` can be provided. With no
+        arguments, connection's default is used.
+        '''
+        if max_object_cnt is not None:
+            controller = BatchSizeController(
+                max_object_cnt, max_object_cnt, max_object_cnt,
+                adaptive=False)
+        self.batch_controller = controller
+
 
 class OPInstanceNamesBase(OPBase):
     '''
@@ -108,11 +339,47 @@ class OPInstancesBase(OPBase):
 
 
 class OPEnumerateInstanceNames(OPInstanceNamesBase):
+    SUPPORTS_QUERY = True
+
     def __init__(self, ClassName, namespace=None):
         super(OPEnumerateInstanceNames, self).__init__(ClassName, namespace)
+        self.classname = ClassName
+        self.namespace = namespace
+
+    # Filtered properties don't need to be keys, so client side filter is
+    # evaluated on instances with just the filtered properties.
+
+    def make_method(self, client, use_pull=True):
+        if self.filter_mode != FILTER_CLIENT:
+            return super(OPEnumerateInstanceNames, self).make_method(
+                client, use_pull)
+        if not use_pull:
+            return client.EnumerateInstances
+        elif self.ctx is None:
+            return client.OpenEnumerateInstances
+        return client.PullInstances
+
+    def make_method_args(self, use_pull=True, max_object_cnt=MAX_OBJECT_CNT):
+        args, kwargs = super(OPEnumerateInstanceNames, self).make_method_args(
+            use_pull, max_object_cnt)
+        if self.filter_mode == FILTER_CLIENT and self.ctx is None:
+            kwargs = dict(kwargs, PropertyList=self.query.names)
+        return args, kwargs
+
+    def filter_elements(self, elements):
+        elements = super(OPEnumerateInstanceNames, self).filter_elements(
+            elements)
+        if self.filter_mode == FILTER_CLIENT:
+            elements = self.from_instances(elements)
+        return elements
+
+    def from_instances(self, instances):
+        return [inst.path for inst in instances]
 
 
 class OPEnumerateInstances(OPInstancesBase):
+    SUPPORTS_QUERY = True
+
     def __init__(self, ClassName, namespace=None, LocalOnly=True,
                  DeepInheritance=True, IncludeQualifiers=False,
                  IncludeClassOrigin=False, PropertyList=None):
@@ -123,6 +390,27 @@ class OPEnumerateInstances(OPInstancesBase):
             IncludeQualifiers=IncludeQualifiers,
             IncludeClassOrigin=IncludeClassOrigin,
             PropertyList=PropertyList)
+        self.classname = ClassName
+        self.namespace = namespace
+
+    def exec_query_equivalent(self):
+        # ExecQuery returns all the properties of instances of subclasses,
+        # too, without qualifiers and class origins; the projection is
+        # applied by from_instances().
+        kwargs = self.kwargs
+        return not kwargs['LocalOnly'] and kwargs['DeepInheritance'] and \
+            not kwargs['IncludeQualifiers'] and \
+            not kwargs['IncludeClassOrigin']
+
+    def from_instances(self, instances):
+        PropertyList = self.kwargs['PropertyList']
+        if PropertyList is not None:
+            names = set(name.lower() for name in PropertyList)
+            for inst in instances:
+                for name in inst.properties.keys():
+                    if name.lower() not in names:
+                        del inst.properties[name]
+        return instances
 
 
 class OPAssociators(OPInstancesBase):
@@ -176,27 +464,116 @@ class OPReferenceNames(OPInstanceNamesBase):
 #
 # for elem in enumerator:
 #     do_something_with(elem)
+#
+# With prefetch=N, a worker thread reads up to N batches ahead, while the
+# consumer processes the current one. Clients are not thread-safe, so the
+# worker pulls over a client acquired from pool; without a pool, it uses the
+# enumerator's client, which then must not be used by anybody else meanwhile.
 # ------------------------------------------------------------------------------
 
+# Markers of items passed from prefetching thread to consumer.
+_PREFETCH_BATCH, _PREFETCH_ERROR, _PREFETCH_END = range(3)
+
+# How often blocked prefetch queue operations check for a stop (seconds).
+_PREFETCH_POLL_TIME = 0.1
+
 
 class Enumerator(object):
     '''
     Enumeration provider.
+
+    :param client: client object
+    :param op: enumeration operation
+    :param int prefetch: number of batches read ahead in a separate thread;
+        0 disables the read-ahead
+    :param pool: :py:class:`.ClientPool`, which provides the client of the
+        read-ahead thread; if None, the thread uses client
     '''
-    def __init__(self, client, op=None):
+    def __init__(self, client, op=None, prefetch=0, pool=None):
         self.client = client
         self.op = op
+        self.prefetch = prefetch
+        self.pool = pool
 
     def __iter__(self):
         if self.op is None:
             raise ValueError('set_operation() must precede __iter__()')
 
-        while True:
-            elements = self.op(self.client)
-            for element in elements:
-                yield element
-            if self.op.finished():
-                break
+        if self.prefetch > 0:
+            elements = self.iter_prefetch()
+        else:
+            elements = self.iter_serial()
+        for element in elements:
+            yield element
+
+    def iter_serial(self):
+        try:
+            while True:
+                elements = self.op(self.client)
+                for element in elements:
+                    yield element
+                if self.op.finished():
+                    break
+        finally:
+            # Consumer may stop early.
+            self.op.close(self.client)
+
+    def iter_prefetch(self):
+        batches = Queue.Queue(self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # Don't block forever, if the consumer is gone.
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=_PREFETCH_POLL_TIME)
+                    return
+                except Queue.Full:
+                    pass
+
+        def pull(client):
+            try:
+                while not stop.is_set():
+                    put((_PREFETCH_BATCH, self.op(client)))
+                    if self.op.finished():
+                        break
+            finally:
+                # Consumer may stop early; the enumeration context belongs
+                # to this client.
+                self.op.close(client)
+
+        def worker():
+            try:
+                if self.pool is None:
+                    pull(self.client)
+                else:
+                    with self.pool.client() as client:
+                        pull(client)
+            except Exception:
+                put((_PREFETCH_ERROR, sys.exc_info()))
+            put((_PREFETCH_END, None))
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                try:
+                    # Poll, so the consumer can be interrupted.
+                    kind, value = batches.get(timeout=_PREFETCH_POLL_TIME)
+                except Queue.Empty:
+                    continue
+                if kind == _PREFETCH_BATCH:
+                    for element in value:
+                        yield element
+                elif kind == _PREFETCH_ERROR:
+                    raise value[0], value[1], value[2]
+                else:
+                    break
+        finally:
+            stop.set()
+            thread.join()
 
     def validate_operation(self, op=None):
         op = op or self.op
@@ -0,0 +1,224 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from lmi.shell import exc
+from lmi.shell.logger import logger
+
+
+# Default maximum number of clients in a pool.
+DEFAULT_POOL_SIZE = 4
+
+# Default time, after which idle clients are disconnected (seconds).
+DEFAULT_IDLE_TIMEOUT = 60
+
+# Pool metrics. opened, closed and acquired count pooled clients created,
+# disconnected and checked out; connections and requests count connections
+# opened and requests sent by all clients of the CIMOM connection, including
+# its main client. Connections are kept open and reused, so requests is
+# normally much greater than connections.
+PoolStats = namedtuple(
+    'PoolStats',
+    ['opened', 'closed', 'acquired', 'connections', 'requests', 'idle',
+     'busy'])
+
+# Transport metrics of a client and its clones.
+TransportStats = namedtuple('TransportStats', ['connections', 'requests'])
+
+
+class TransportCounter(object):
+    '''
+    Thread-safe counts of connections opened and requests sent over the
+    transport; shared by a client and its clones.
+    '''
+    def __init__(self):
+        self.cnt_connections = 0
+        self.cnt_requests = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return '%s(connections=%d, requests=%d)' % (
+            self.__class__.__name__, self.cnt_connections, self.cnt_requests)
+
+    @property
+    def stats(self):
+        '''
+        :returns: :py:class:`TransportStats` of the counted clients
+        '''
+        with self.lock:
+            return TransportStats(self.cnt_connections, self.cnt_requests)
+
+    def connected(self):
+        with self.lock:
+            self.cnt_connections += 1
+
+    def sent(self):
+        with self.lock:
+            self.cnt_requests += 1
+
+
+class ClientPool(object):
+    '''
+    Bounded pool of clients connected to one CIMOM. Clients are created on
+    demand by factory and kept connected between uses, so their connections
+    (and TLS sessions) are reused; a client is used by one thread at a time.
+    Clients idle for longer than idle_timeout are disconnected.
+
+    :param factory: callable returning a new connected client
+    :param int size: maximum number of clients
+    :param float idle_timeout: seconds, after which an idle client is
+        disconnected; None keeps idle clients forever
+    :param counter: :py:class:`TransportCounter` shared by the pooled clients
+        and the main client of the connection; used by :py:attr:`stats`
+    '''
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, counter=None):
+        if size < 1:
+            raise ValueError('size must be positive')
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.counter = counter or TransportCounter()
+        # Idle clients with their release times; the most recently released
+        # ones are at the end.
+        self.idle = []
+        self.cnt_open = 0
+        self.cnt_opened = 0
+        self.cnt_closed = 0
+        self.cnt_acquired = 0
+        self.cond = threading.Condition()
+
+    def __repr__(self):
+        return '%s(size=%d, open=%d)' % (
+            self.__class__.__name__, self.size, self.cnt_open)
+
+    @property
+    def stats(self):
+        '''
+        :returns: :py:class:`PoolStats` of the pool
+        '''
+        transport = self.counter.stats
+        with self.cond:
+            return PoolStats(
+                self.cnt_opened, self.cnt_closed, self.cnt_acquired,
+                transport.connections, transport.requests,
+                len(self.idle), self.cnt_open - len(self.idle))
+
+    def acquire(self):
+        '''
+        Returns an idle client, or a new one, if the pool is not full. Blocks
+        until a client is released otherwise.
+        '''
+        with self.cond:
+            expired = self._expire()
+            while not self.idle and self.cnt_open >= self.size:
+                self.cond.wait()
+            self.cnt_acquired += 1
+            if self.idle:
+                client = self.idle.pop()[0]
+            else:
+                client = None
+                self.cnt_open += 1
+        self._disconnect(expired)
+
+        if client is not None:
+            return client
+
+        try:
+            client = self.factory()
+        except:
+            with self.cond:
+                self.cnt_open -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.cnt_opened += 1
+        return client
+
+    def release(self, client, discard=False):
+        '''
+        Returns a client acquired by :py:meth:`acquire` to the pool.
+
+        :param bool discard: if True, the client is disconnected instead;
+            used for clients with broken connections
+        '''
+        with self.cond:
+            if discard:
+                self.cnt_open -= 1
+            else:
+                self.idle.append((client, time.time()))
+            expired = self._expire()
+            self.cond.notify()
+        if discard:
+            expired.append(client)
+        self._disconnect(expired)
+
+    @contextmanager
+    def client(self):
+        '''
+        Context manager, which acquires a client and releases it at exit.
+        '''
+        client = self.acquire()
+        try:
+            yield client
+        except exc.ConnectionError:
+            self.release(client, discard=True)
+            raise
+        except:
+            self.release(client)
+            raise
+        else:
+            self.release(client)
+
+    def close(self):
+        '''
+        Disconnects idle clients.
+        '''
+        with self.cond:
+            idle, self.idle = self.idle, []
+            self.cnt_open -= len(idle)
+            self.cond.notify_all()
+        self._disconnect([client for client, released in idle])
+
+    def _expire(self):
+        '''
+        Removes clients idle for too long; must be called with the lock held.
+        Returns the removed clients.
+        '''
+        if self.idle_timeout is None:
+            return []
+        deadline = time.time() - self.idle_timeout
+        cnt = 0
+        while cnt < len(self.idle) and self.idle[cnt][1] < deadline:
+            cnt += 1
+        expired = [client for client, released in self.idle[:cnt]]
+        del self.idle[:cnt]
+        self.cnt_open -= cnt
+        if cnt:
+            self.cond.notify_all()
+        return expired
+
+    def _disconnect(self, clients):
+        for client in clients:
+            with self.cond:
+                self.cnt_closed += 1
+            try:
+                client.disconnect()
+            except Exception as e:
+                logger.debug('Can\'t disconnect pooled client: %s', e)
@@ -0,0 +1,150 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import cPickle
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+
+from lmi.shell.logger import logger
+
+
+DEFAULT_SCHEMA_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'lmishell', 'schema')
+
+
+def _digest(value):
+    return hashlib.sha1(repr(value)).hexdigest()
+
+
+def dumps(value):
+    '''
+    Serializes a schema object into a compact string.
+    '''
+    return zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+
+
+def loads(data):
+    '''
+    Deserializes a schema object previously serialized by :py:func:`dumps`.
+    '''
+    return cPickle.loads(zlib.decompress(data))
+
+
+class SchemaStore(object):
+    '''
+    Persistent on-disk store of CIM schema objects (classes and class name
+    lists), which is shared across LMIShell runs. Stored objects are keyed by
+    CIMOM URL, namespace and schema version (see
+    :py:meth:`.CIMXMLClient.schema_version`); each object is kept in a
+    separate file as a compressed pickle.
+
+    :param string path: directory, where the schema objects are stored
+    '''
+    def __init__(self, path=DEFAULT_SCHEMA_DIR):
+        self.path = path
+
+    def __repr__(self):
+        return '%s(path=%s)' % (self.__class__.__name__, repr(self.path))
+
+    def url_dir(self, url):
+        return os.path.join(self.path, _digest(url))
+
+    def namespace_dir(self, url, namespace):
+        return os.path.join(self.url_dir(url), namespace.replace('/', '_'))
+
+    def filename(self, url, namespace, version, key):
+        return os.path.join(
+            self.namespace_dir(url, namespace), _digest(version), _digest(key))
+
+    def get(self, url, namespace, version, key):
+        '''
+        Returns a stored schema object; None, if there is no such object.
+        '''
+        filename = self.filename(url, namespace, version, key)
+        try:
+            with open(filename, 'rb') as fin:
+                return loads(fin.read())
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.debug('Can\'t read schema object %s: %s', filename, e)
+        except Exception as e:
+            # Corrupted or incompatible file; drop it.
+            logger.debug('Dropping invalid schema object %s: %s', filename, e)
+            self._unlink(filename)
+        return None
+
+    def set(self, url, namespace, version, key, value):
+        '''
+        Stores a schema object. Failures are logged and ignored; the store is
+        only an optimization.
+        '''
+        filename = self.filename(url, namespace, version, key)
+        dirname = os.path.dirname(filename)
+        try:
+            data = dumps(value)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            # Write into a temporary file first, so concurrent LMIShell runs
+            # never see partially written objects.
+            fd, tmp_filename = tempfile.mkstemp(dir=dirname)
+            with os.fdopen(fd, 'wb') as fout:
+                fout.write(data)
+            os.rename(tmp_filename, filename)
+        except Exception as e:
+            logger.debug('Can\'t store schema object %s: %s', filename, e)
+
+    def retain(self, url, namespace, version):
+        '''
+        Removes stored schema objects of a namespace, which belong to other
+        schema versions than version.
+        '''
+        path = self.namespace_dir(url, namespace)
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return
+        keep = _digest(version)
+        for name in names:
+            if name != keep:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def invalidate(self, url=None, namespace=None):
+        '''
+        Removes stored schema objects.
+
+        :param string url: CIMOM URL; if None, objects of all CIMOMs are
+            removed
+        :param string namespace: namespace; if None, objects of all namespaces
+            are removed. Used only together with url.
+        '''
+        if url is None:
+            path = self.path
+        elif namespace is None:
+            path = self.url_dir(url)
+        else:
+            path = self.namespace_dir(url, namespace)
+        shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _unlink(filename):
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
@@ -98,7 +98,7 @@ class CIMIndicationHandler(ThreadingMixIn, BaseHTTPRequestHandler):
             ind_dict = export_methods.values()[0]
             if "NewIndication" in ind_dict:
                 ind = ind_dict["NewIndication"]
-        path = self.path
+        path = self.path.lstrip("/")
         if path.startswith("CIMListener/"):
             # We got an indication with lmiwbem CIMListener prefix. We are
             # using pywbem now so it's necessary to strip the prefix.
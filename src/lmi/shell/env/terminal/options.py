@@ -66,6 +66,10 @@ class OptionsParser(argparse.ArgumentParser):
             '--cwd-first-in-path', action='store_true', default=False,
             dest='cwd_first_in_path',
             help='prepend CWD in sys.path instead of appending it')
+        parser.add_argument(
+            '--clear-schema-cache', action='store_true', default=False,
+            dest='clear_schema_cache',
+            help='remove all CIM schema objects stored on disk')
         return parser
 
 
@@ -88,6 +92,8 @@ class Options(object):
         Do not print any log messages to stderr.
     no_verify : bool
         Do **not** verify CIMOM SSL certificate.
+    clear_schema_cache : bool
+        Remove all CIM schema objects stored on disk.
     '''
 
     def __init__(self, args=sys.argv):
@@ -89,6 +89,20 @@ class LMIFilterError(Exception):
     '''
 
 
+class LMIOperationSkipped(Exception):
+    '''
+    Reported in results of bulk operations for items, which were not
+    processed, because an operation on a previous item failed.
+    '''
+
+
+class LMISnapshotError(Exception):
+    '''
+    Raised, when an operation can't be done on a snapshot, which is
+    read-only and works without CIMOM.
+    '''
+
+
 class LMIClassNotFound(AttributeError):
     '''
     Raised, when trying to access missing class in LMINamespace.
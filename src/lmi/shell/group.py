@@ -0,0 +1,209 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Connection groups run LMIShell operations on many CIMOMs concurrently.
+
+Example of usage:
+
+    group = connect_group(['host1', 'host2'], 'user', 'pass')
+    for result in group.root.cimv2.LMI_Account.instances():
+        if result.error is None:
+            print result.uri, result.value.Name
+'''
+
+__all__ = [
+    'LMIConnectionGroup',
+    'LMIHostResult',
+    'connect_group',
+]
+
+import sys
+import types
+from collections import namedtuple, OrderedDict
+
+from lmi.shell import con, exc
+from lmi.shell.logger import logger
+from lmi.shell.util import is_negative, parallel, prompt, url
+
+
+# Outcome of an operation on one host; either value, or error is set.
+LMIHostResult = namedtuple('LMIHostResult', ['uri', 'value', 'error'])
+
+
+def connect_group(uris, username='', password='', key_file=None,
+                  cert_file=None, workers=parallel.DEFAULT_WORKERS,
+                  prompt_prefix='', **kwargs):
+    '''
+    Connects to several CIMOMs concurrently and returns a
+    :py:class:`LMIConnectionGroup` of the connected ones. Hosts, which
+    failed to connect, are listed in the group's failed dictionary.
+
+    Credentials are shared by all the hosts. If they are needed and missing,
+    they are prompted for once, before connecting; hosts are never prompted
+    for from the connecting threads.
+
+    :param uris: list of CIMOM URIs
+    :param int workers: number of concurrent connection attempts; also used
+        by the group's operations
+    :param kwargs: other arguments of :py:func:`.connect`
+    '''
+    uris = list(uris)
+    need_creds = any(
+        not url.is_localhost(uri) and url.parse(uri).creds is None
+        for uri in uris)
+    if need_creds and is_negative(key_file, cert_file):
+        try:
+            if not username:
+                username = prompt.prompt_input(prompt_prefix + 'username: ')
+            if not password:
+                password = prompt.prompt_input(
+                    prompt_prefix + 'password: ', echo=False)
+        except KeyboardInterrupt as e:
+            sys.stdout.write('\n')
+            return None
+
+    def connect(uri):
+        connection = con.connect(
+            uri, username, password, key_file=key_file, cert_file=cert_file,
+            interactive=False, **kwargs)
+        if connection is None:
+            raise exc.ConnectionError('connection to %s cancelled' % uri)
+        return [connection]
+
+    group = LMIConnectionGroup(workers=workers)
+    for uri, connection, error in parallel.stream(connect, uris, workers):
+        if error is None:
+            group.add(connection, uri)
+        else:
+            logger.info('Can\'t connect to %s: %s', uri, error)
+            group.failed[uri] = error
+
+    # Keep the order of URIs.
+    group.connections = OrderedDict(
+        (uri, group.connections[uri])
+        for uri in uris if uri in group.connections)
+    return group
+
+
+class LMIConnectionGroup(object):
+    '''
+    Group of :py:class:`.LMIConnection` objects. Operations are run on all
+    the members concurrently; each operation yields
+    :py:class:`LMIHostResult` objects as the hosts respond, so slow or
+    failing hosts don't hold up the others.
+
+    The group can be navigated as a connection; calling a method at the end
+    of the path runs it on every member:
+
+        group.root.cimv2.LMI_Account.instances()
+
+    Methods returning generators yield one result per generated value.
+
+    :param connections: list of connected :py:class:`.LMIConnection` objects
+    :param int workers: number of hosts served concurrently
+    '''
+    def __init__(self, connections=None, workers=parallel.DEFAULT_WORKERS):
+        self.connections = OrderedDict()
+        self.failed = {}
+        self.workers = workers
+        for connection in connections or []:
+            self.add(connection)
+
+    def __repr__(self):
+        return '%s(%d connections, %d failed)' % (
+            self.__class__.__name__, len(self.connections), len(self.failed))
+
+    def __len__(self):
+        return len(self.connections)
+
+    def __iter__(self):
+        return self.connections.itervalues()
+
+    def __getitem__(self, uri):
+        return self.connections[uri]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _LMIGroupPath(self, (name, ))
+
+    def add(self, connection, uri=None):
+        '''
+        Adds a connection to the group.
+
+        :param connection: :py:class:`.LMIConnection` object
+        :param string uri: key of the connection; connection's URL by default
+        '''
+        self.connections[uri or connection.url] = connection
+
+    def remove(self, uri):
+        '''
+        Removes a connection from the group and returns it.
+        '''
+        return self.connections.pop(uri)
+
+    def map(self, func):
+        '''
+        Calls func(connection) for every member concurrently. Yields a
+        :py:class:`LMIHostResult` for the returned value; if func returns a
+        generator, one result is yielded for every generated value.
+        '''
+        def call(uri):
+            value = func(self.connections[uri])
+            if isinstance(value, types.GeneratorType):
+                return value
+            return [value]
+
+        results = parallel.stream(call, self.connections.keys(), self.workers)
+        for uri, value, error in results:
+            yield LMIHostResult(uri, value, error)
+
+    def disconnect(self):
+        '''
+        Disconnects all the members.
+        '''
+        for result in self.map(lambda connection: connection.disconnect()):
+            if result.error is not None:
+                logger.debug(
+                    'Can\'t disconnect from %s: %s', result.uri, result.error)
+
+
+class _LMIGroupPath(object):
+    '''
+    Attribute path within connection group members, eg. root.cimv2.LMI_Foo.
+    Calling the path runs the call on all members.
+    '''
+    def __init__(self, group, path):
+        self._group = group
+        self._path = path
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, '.'.join(self._path))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _LMIGroupPath(self._group, self._path + (name, ))
+
+    def _resolve(self, connection):
+        member = connection
+        for name in self._path:
+            member = getattr(member, name)
+        return member
+
+    def __call__(self, *args, **kwargs):
+        return self._group.map(
+            lambda connection: self._resolve(connection)(*args, **kwargs))
@@ -1,54 +1,57 @@
+from lmi.shell.core import wbem
+from lmi.shell.core.cache import InstanceCache
+from lmi.shell.logger import logger
 
 def subscribe():
 
-        '''
-        Subscribes to an indication. Indication is formed by 3 objects, where 2
-        of them (filter and handler) can be provided, if the LMIShell should
-        not create those 2 by itself.
-
-        **NOTE:** Currently the call registers :py:mod:`atexit` hook, which
-        auto-deletes all subscribed indications by the LMIShell.
-
-        :param dictionary kwargs: parameters for the indication subscription
-
-            * **Filter** (*LMIInstance*) -- if provided, the
-              :py:class:`.LMIInstance` object will be used instead of creating
-              a new one;
-              **optional**
-            * **Handler** (*LMIInstance*) -- if provided, the
-              :py:class:`.LMIInstance` object will be used instead of creating
-              a new one; **optional**
-            * **Query** (*string*) -- string containing a query for the
-              indications filtering
-            * **QueryLanguage** (*string*) -- query language; eg. *WQL*, or
-              *DMTF:CQL*.  This parameter is optional, default value is
-              *DMTF:CQL*.
-            * **Name** (*string*) -- indication name
-            * **CreationNamespace** (*string*) -- creation namespace. This
-              parameter is optional, default value is *root/interop*.
-            * **SubscriptionCreationClassName** (*string*) -- subscription
-              object class name. This parameter is optional, default value is
-              *CIM_IndicationSubscription*.
-            * **Permanent** (*bool*) -- whether to preserve the created
-              subscription on LMIShell's quit. Default value is False.
-            * **FilterCreationClassName** (*string*) -- creation class name of
-              the filter object. This parameter is options, default value is
-              *CIM_IndicationFilter*.
-            * **FilterSystemCreationClassName** (*string*) -- system creation
-              class name of the filter object. This parameter is optional,
-              default value is *CIM_ComputerSystem*.
-            * **FilterSourceNamespace** (*string*) -- local namespace where the
-              indications originate. This parameter is optional, default value
-              is *root/cimv2*.
-            * **HandlerCreationClassName** (*string*) -- creation class name of
-              the handler object. This parameter is optional, default value is
-              *CIM_IndicationHandlerCIMXML*.
-            * **HandlerSystemCreationClassName** (*string*) -- system creation
-              name of the handler object. This parameter is optional, default
-              value is *CIM_ComputerSystem*.
-            * **Destination** (*string*) -- destination URI, where the
-              indications should be delivered
-        '''
+    '''
+    Subscribes to an indication. Indication is formed by 3 objects, where 2
+    of them (filter and handler) can be provided, if the LMIShell should
+    not create those 2 by itself.
+
+    **NOTE:** Currently the call registers :py:mod:`atexit` hook, which
+    auto-deletes all subscribed indications by the LMIShell.
+
+    :param dictionary kwargs: parameters for the indication subscription
+
+        * **Filter** (*LMIInstance*) -- if provided, the
+          :py:class:`.LMIInstance` object will be used instead of creating
+          a new one;
+          **optional**
+        * **Handler** (*LMIInstance*) -- if provided, the
+          :py:class:`.LMIInstance` object will be used instead of creating
+          a new one; **optional**
+        * **Query** (*string*) -- string containing a query for the
+          indications filtering
+        * **QueryLanguage** (*string*) -- query language; eg. *WQL*, or
+          *DMTF:CQL*.  This parameter is optional, default value is
+          *DMTF:CQL*.
+        * **Name** (*string*) -- indication name
+        * **CreationNamespace** (*string*) -- creation namespace. This
+          parameter is optional, default value is *root/interop*.
+        * **SubscriptionCreationClassName** (*string*) -- subscription
+          object class name. This parameter is optional, default value is
+          *CIM_IndicationSubscription*.
+        * **Permanent** (*bool*) -- whether to preserve the created
+          subscription on LMIShell's quit. Default value is False.
+        * **FilterCreationClassName** (*string*) -- creation class name of
+          the filter object. This parameter is options, default value is
+          *CIM_IndicationFilter*.
+        * **FilterSystemCreationClassName** (*string*) -- system creation
+          class name of the filter object. This parameter is optional,
+          default value is *CIM_ComputerSystem*.
+        * **FilterSourceNamespace** (*string*) -- local namespace where the
+          indications originate. This parameter is optional, default value
+          is *root/cimv2*.
+        * **HandlerCreationClassName** (*string*) -- creation class name of
+          the handler object. This parameter is optional, default value is
+          *CIM_IndicationHandlerCIMXML*.
+        * **HandlerSystemCreationClassName** (*string*) -- system creation
+          name of the handler object. This parameter is optional, default
+          value is *CIM_ComputerSystem*.
+        * **Destination** (*string*) -- destination URI, where the
+          indications should be delivered
+    '''
 
     if self.is_wsman():
         raise TypeError('Indication subscription not supported')
@@ -195,3 +198,137 @@ def subscribed_indications(self):
     :returns: list of all the subscribed indications
     '''
     return self._indications.keys()
+
+
+def create_subscription(client, name, query, destination,
+                        query_lang='DMTF:CQL', namespace='root/interop',
+                        source_namespace='root/cimv2'):
+    '''
+    Creates indication filter, handler and subscription on CIMOM. Indications
+    are delivered to ``<destination>/CIMListener/<name>``.
+
+    :returns: list of instance names of created filter, handler and
+        subscription
+    '''
+    def create_instance(classname, properties):
+        path = wbem.CIMInstanceName(classname, namespace=namespace)
+        return client.CreateInstance(
+            wbem.CIMInstance(classname, properties, path=path))
+
+    created = []
+    try:
+        created.append(create_instance('CIM_IndicationFilter', {
+            'CreationClassName': 'CIM_IndicationFilter',
+            'SystemCreationClassName': 'CIM_ComputerSystem',
+            'SystemName': client.url,
+            'SourceNamespace': source_namespace,
+            'Query': query,
+            'QueryLanguage': query_lang,
+            'Name': name + '-filter'}))
+        created.append(create_instance('CIM_IndicationHandlerCIMXML', {
+            'CreationClassName': 'CIM_IndicationHandlerCIMXML',
+            'SystemCreationClassName': 'CIM_ComputerSystem',
+            'SystemName': client.url,
+            'Destination': '%s/CIMListener/%s' % (destination, name),
+            'Name': name + '-handler'}))
+        created.append(create_instance('CIM_IndicationSubscription', {
+            'Filter': created[0],
+            'Handler': created[1]}))
+    except Exception:
+        delete_subscription(client, created)
+        raise
+    return created
+
+
+def delete_subscription(client, inst_names):
+    '''
+    Deletes objects created by :py:func:`create_subscription`. Errors are
+    logged and ignored.
+    '''
+    # Subscription must be deleted before its filter and handler.
+    for inst_name in reversed(inst_names):
+        try:
+            client.DeleteInstance(inst_name)
+        except Exception as e:
+            logger.warn('Can\'t delete \'%s\': %s', inst_name, e)
+
+
+class LMIInstanceCacheSubscription(object):
+    '''
+    Keeps client's :py:class:`.InstanceCache` consistent with CIMOM. For
+    every class, it subscribes to CIM_InstCreation, CIM_InstModification and
+    CIM_InstDeletion indications and passes them to the cache.
+
+    :param client: CIM-XML client
+    :param classnames: names of classes, whose instances are cached
+    :param listener: :py:class:`wbem.CIMIndicationListener` receiving the
+        indications; it is started, if it doesn't run
+    :param string destination: URL of the listener as seen by CIMOM; if None,
+        it is made from listener's hostname and port
+    :param InstanceCache cache: cache to use; if None, a new one is created
+    '''
+    INDICATION_CLASSNAMES = (
+        InstanceCache.IND_CREATION,
+        InstanceCache.IND_MODIFICATION,
+        InstanceCache.IND_DELETION)
+
+    def __init__(self, client, classnames, listener, destination=None,
+                 cache=None, source_namespace='root/cimv2'):
+        self.client = client
+        self.classnames = list(classnames)
+        self.listener = listener
+        self.destination = destination
+        self.cache = cache if cache is not None else InstanceCache()
+        self.source_namespace = source_namespace
+        self.subscriptions = {}
+
+    def __repr__(self):
+        return '%s(classnames=%s, ...)' % (
+            self.__class__.__name__, repr(self.classnames))
+
+    def make_destination(self):
+        scheme = 'https' if self.listener.uses_ssl else 'http'
+        return '%s://%s:%d' % (
+            scheme, self.listener.hostname, self.listener.port)
+
+    def start(self):
+        '''
+        Subscribes to the indications and attaches the cache to the client.
+        '''
+        if not self.listener.is_alive:
+            self.listener.start()
+        destination = self.destination or self.make_destination()
+
+        try:
+            for classname in self.classnames:
+                for ind_classname in self.INDICATION_CLASSNAMES:
+                    name = 'lmishell-cache-%s-%s-%x' % (
+                        classname, ind_classname, id(self))
+                    query = 'SELECT * FROM %s WHERE SourceInstance ISA %s' % (
+                        ind_classname, classname)
+                    self.listener.add_handler(
+                        name, self.cache.handle_indication, ind_classname,
+                        self.source_namespace)
+                    self.subscriptions[name] = []
+                    self.subscriptions[name] = create_subscription(
+                        self.client, name, query, destination,
+                        source_namespace=self.source_namespace)
+        except Exception:
+            self.stop()
+            raise
+
+        self.client.instance_cache = self.cache
+
+    def stop(self):
+        '''
+        Detaches the cache from the client and deletes the subscriptions.
+        '''
+        if self.client.instance_cache is self.cache:
+            self.client.instance_cache = None
+        self.cache.clear()
+        for name, inst_names in self.subscriptions.iteritems():
+            delete_subscription(self.client, inst_names)
+        for name in self.listener.handlers:
+            if name in self.subscriptions:
+                self.listener.remove_handler(name)
+        self.subscriptions = {}
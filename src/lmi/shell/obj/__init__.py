@@ -18,24 +18,38 @@ from impl.base import CIMBase, LMIBase
 # the implementation, there is a circular dependency.
 class _LMIProxy(object):
     '''
-    Proxy class for descendant
+    Proxy class for descendant. The implementation is imported on first use
+    and cached; then the proxy replaces itself in this module by the class,
+    so further lookups, such as obj.LMIInstance, get the class directly.
+    Proxies imported elsewhere keep working, including isinstance() and
+    issubclass() checks.
     '''
     def __init__(self, module_name, cls_name):
         self.module_name = module_name
         self.cls_name = cls_name
+        self._cls = None
 
     def __getattr__(self, name):
         return getattr(self.cls, name)
 
     def __call__(self, *args, **kwargs):
-        return self.cls(*args, **kwargs)
+        return (self._cls or self.cls)(*args, **kwargs)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self._cls or self.cls)
+
+    def __subclasscheck__(self, subclass):
+        return issubclass(subclass, self.cls)
 
     @property
     def cls(self):
-        m = __import__(
-            'lmi.shell.obj.impl.%s' % self.module_name,
-            fromlist=[self.cls_name])
-        return getattr(m, self.cls_name)
+        if self._cls is None:
+            m = __import__(
+                'lmi.shell.obj.impl.%s' % self.module_name,
+                fromlist=[self.cls_name])
+            self._cls = getattr(m, self.cls_name)
+            globals()[self.cls_name] = self._cls
+        return self._cls
 
 
 class _LMINamespaceProxy(_LMIProxy):
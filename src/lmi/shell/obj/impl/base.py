@@ -2,6 +2,8 @@ class CIMBase(object):
     '''
     Base class for CIM wrapper classes.
     '''
+    __slots__ = ('conn', )
+
     def __init__(self, conn):
         self.conn = conn
 
@@ -10,6 +12,8 @@ class LMIBase(CIMBase):
     '''
     Base class for LMI wrapper classes.
     '''
+    __slots__ = ()
+
     def __init__(self, conn):
         super(LMIBase, self).__init__(conn)
 
@@ -1,7 +1,8 @@
-from lmi.shell import exc, obj, util
+from lmi.shell import bulk, exc, obj, util
 from lmi.shell.core import enum, wbem
 from lmi.shell.logger import logger
-from lmi.shell.util import cast
+from lmi.shell.util import cast, columns, export, parallel, projection
+from clsmeta import class_metadata
 
 
 class CIMClassProvider(obj.CIMBase):
@@ -66,8 +67,9 @@ class LMIClass(obj.LMIBase):
     def __getattr__(self, name):
         if name.endswith('Values'):
             property_name = name[:-6]
-            return obj.LMIConstantValuesParamProp(
-                self.cim_class_full.properties[property_name])
+            return class_metadata(
+                self.conn, self.classname, self.namespace).property_values(
+                    property_name)
         raise AttributeError(name)
 
     def __iter__(self):
@@ -89,6 +91,31 @@ class LMIClass(obj.LMIBase):
         #    logger().info("WSMAN client doesn't support CreateInstance()")
         #    return None
 
+        return obj.LMIInstanceName(
+            self.conn,
+            self.conn.client.CreateInstance(
+                self._new_cim_instance(properties, qualifiers, property_list)))
+
+    def create_instances(self, properties_list,
+                         workers=parallel.DEFAULT_WORKERS,
+                         stop_on_error=False):
+        '''
+        Creates many instances of the class concurrently; see
+        :py:func:`.bulk.create_instances`.
+
+        :param properties_list: iterable of property dictionaries, one per
+            new instance
+        :returns: list of :py:class:`.LMIBulkResult` objects; their values
+            are :py:class:`.LMIInstanceName` objects
+        '''
+        return bulk.create_instances(
+            self.conn,
+            [self._new_cim_instance(properties) for properties in
+             properties_list],
+            workers, stop_on_error)
+
+    def _new_cim_instance(self, properties=None, qualifiers=None,
+                          property_list=None):
         # No need to copy dictionaries to avoid the variable mix-up, the
         # copying is done in client.CreateInstance(), we just pass
         # what we get.
@@ -103,30 +130,46 @@ class LMIClass(obj.LMIBase):
                 value = value.wrapped_object
             t = self_properties[key].type
             properties[key] = cast.to_cim(t, value)
-        return obj.LMIInstanceName(
-            self.conn,
-            self.conn.client.CreateInstance(
-                wbem.CIMInstance(
-                    self.classname,
-                    properties,
-                    qualifiers,
-                    None,
-                    property_list)))
+        return wbem.CIMInstance(
+            self.classname,
+            properties,
+            qualifiers,
+            None,
+            property_list)
 
     def doc(self):
         raise NotImplementedError('doc')
 
-    def instance_names(self, inst_filter=None, limit=-1):
+    def instance_names(self, inst_filter=None, limit=-1, MaxObjectCnt=None,
+                       prefetch=0):
         op = enum.OPEnumerateInstanceNames(
             self.classname,
             self.namespace)
         op.set_filter(inst_filter)
         op.set_limit(limit)
-        enumerator = enum.Enumerator(self.conn.client)
-        enumerator.set_operation(op)
+        op.set_batch_size(MaxObjectCnt)
+        enumerator = self._enumerator(self.conn.client, op, prefetch)
         for inst_name in enumerator:
             yield obj.LMIInstanceName(self.conn, inst_name)
 
+    def _enumerator(self, client, op, prefetch):
+        '''
+        Returns an :py:class:`.Enumerator` of op over client. If client is
+        the connection's one, batches are read ahead over a pooled client,
+        because the consumer keeps using the connection's client (GetClass,
+        GetInstance); read-ahead is disabled for clients, which can't be
+        pooled.
+        '''
+        pool = None
+        if prefetch > 0 and client is self.conn.client:
+            if hasattr(client, 'clone'):
+                pool = self.conn.client_pool()
+            else:
+                prefetch = 0
+        enumerator = enum.Enumerator(client, prefetch=prefetch, pool=pool)
+        enumerator.set_operation(op)
+        return enumerator
+
     def first_instance_name(self, inst_filter=None):
         return util.generator_first(self.instance_names(inst_filter, limit=1))
 
@@ -146,7 +189,38 @@ class LMIClass(obj.LMIBase):
 
     def instances(self, inst_filter=None, limit=-1, LocalOnly=True,
                   DeepInheritance=True, IncludeQualifiers=False,
-                  IncludeClassOrigin=False, PropertyList=None):
+                  IncludeClassOrigin=False, PropertyList=None,
+                  MaxObjectCnt=None, prefetch=0):
+        return self._instances(
+            self.conn.client, inst_filter, limit, LocalOnly, DeepInheritance,
+            IncludeQualifiers, IncludeClassOrigin, PropertyList, MaxObjectCnt,
+            prefetch)
+
+    def _instances(self, client, inst_filter=None, limit=-1, LocalOnly=True,
+                   DeepInheritance=True, IncludeQualifiers=False,
+                   IncludeClassOrigin=False, PropertyList=None,
+                   MaxObjectCnt=None, prefetch=0):
+        '''
+        Enumerates instances over client; returned instances use the
+        connection's client.
+        '''
+        op, proj = self._instances_op(
+            inst_filter, limit, LocalOnly, DeepInheritance, IncludeQualifiers,
+            IncludeClassOrigin, PropertyList, MaxObjectCnt)
+        enumerator = self._enumerator(client, op, prefetch)
+        for inst in enumerator:
+            yield obj.LMIInstance(self.conn, inst, proj)
+
+    def _instances_op(self, inst_filter, limit, LocalOnly, DeepInheritance,
+                      IncludeQualifiers, IncludeClassOrigin, PropertyList,
+                      MaxObjectCnt):
+        '''
+        Returns instance enumeration operation and projection of the
+        enumerated instances.
+        '''
+        PropertyList, proj = projection.resolve(
+            self.conn, PropertyList,
+            projection.key('instances', self.namespace, self.classname))
         op = enum.OPEnumerateInstances(
             self.classname,
             namespace=self.namespace,
@@ -157,10 +231,112 @@ class LMIClass(obj.LMIBase):
             PropertyList=PropertyList)
         op.set_filter(inst_filter)
         op.set_limit(limit)
-        enumerator = enum.Enumerator(self.conn.client)
-        enumerator.set_operation(op)
-        for inst in enumerator:
-            yield obj.LMIInstance(self.conn, inst)
+        op.set_batch_size(MaxObjectCnt)
+        return op, proj
+
+    def instances_async(self, callback, inst_filter=None, limit=-1,
+                        LocalOnly=True, DeepInheritance=True,
+                        IncludeQualifiers=False, IncludeClassOrigin=False,
+                        PropertyList=None, MaxObjectCnt=None,
+                        async_client=None):
+        '''
+        Enumerates instances in background; callback is called with a list
+        of :py:class:`.LMIInstance` objects for every received batch. If
+        callback returns False, the enumeration is closed. See
+        :py:meth:`.AsyncClient.enumerate`.
+
+        :param async_client: :py:class:`.AsyncClient` object to run the
+            enumeration with; if None, a private one is used
+        :returns: :py:class:`multiprocessing.pool.AsyncResult` object; its
+            result is number of received instances
+        '''
+        op, proj = self._instances_op(
+            inst_filter, limit, LocalOnly, DeepInheritance, IncludeQualifiers,
+            IncludeClassOrigin, PropertyList, MaxObjectCnt)
+        return self._enumerate_async(
+            op, lambda inst: obj.LMIInstance(self.conn, inst, proj),
+            callback, async_client)
+
+    def instance_names_async(self, callback, inst_filter=None, limit=-1,
+                             MaxObjectCnt=None, async_client=None):
+        '''
+        Enumerates instance names in background; callback is called with a
+        list of :py:class:`.LMIInstanceName` objects for every received
+        batch. See :py:meth:`instances_async`.
+        '''
+        op = enum.OPEnumerateInstanceNames(
+            self.classname,
+            self.namespace)
+        op.set_filter(inst_filter)
+        op.set_limit(limit)
+        op.set_batch_size(MaxObjectCnt)
+        return self._enumerate_async(
+            op, lambda inst_name: obj.LMIInstanceName(self.conn, inst_name),
+            callback, async_client)
+
+    def _enumerate_async(self, op, wrap, callback, async_client):
+        '''
+        Runs op with async_client and calls callback with wrapped batches.
+        A private client is created for a single enumeration; its executor
+        stops, when the enumeration finishes.
+        '''
+        own = async_client is None
+        if own:
+            async_client = self.conn.async_client(size=1)
+        result = async_client.enumerate(
+            op, lambda batch: callback([wrap(elem) for elem in batch]))
+        if own:
+            # Don't wait for the enumeration; the executor's thread exits
+            # after it.
+            async_client.executor.close()
+        return result
+
+    def columns(self, inst_filter=None, limit=-1, LocalOnly=True,
+                DeepInheritance=True, PropertyList=None, MaxObjectCnt=None,
+                prefetch=0):
+        '''
+        Enumerates instances into a :py:class:`.LMIColumns` object, without
+        creating :py:class:`.LMIInstance` objects. Only properties in
+        PropertyList are kept, if it is passed; references are kept as
+        :py:class:`wbem.CIMInstanceName` objects.
+        '''
+        PropertyList, proj = projection.resolve(
+            self.conn, PropertyList,
+            projection.key('instances', self.namespace, self.classname))
+        op = enum.OPEnumerateInstances(
+            self.classname,
+            namespace=self.namespace,
+            LocalOnly=LocalOnly,
+            DeepInheritance=DeepInheritance,
+            PropertyList=PropertyList)
+        op.set_filter(inst_filter)
+        op.set_limit(limit)
+        op.set_batch_size(MaxObjectCnt)
+        enumerator = self._enumerator(self.conn.client, op, prefetch)
+        cols = columns.LMIColumns(PropertyList)
+        cols.extend(enumerator)
+        return cols
+
+    def export(self, output, fmt=None, PropertyList=None, compress=None,
+               inst_filter=None, limit=-1, LocalOnly=True,
+               DeepInheritance=True, MaxObjectCnt=None, prefetch=0):
+        '''
+        Enumerates instances into a file, in constant memory, and returns
+        their number; see :py:func:`.export.export`. PropertyList is also
+        passed to CIMOM, so only the exported properties are transferred.
+        '''
+        op = enum.OPEnumerateInstances(
+            self.classname,
+            namespace=self.namespace,
+            LocalOnly=LocalOnly,
+            DeepInheritance=DeepInheritance,
+            PropertyList=PropertyList)
+        op.set_filter(inst_filter)
+        op.set_limit(limit)
+        op.set_batch_size(MaxObjectCnt)
+        enumerator = self._enumerator(self.conn.client, op, prefetch)
+        return export.export(
+            enumerator, output, fmt, PropertyList, compress)
 
     def first_instance(self, inst_filter=None, LocalOnly=True,
                   DeepInheritance=True, IncludeQualifiers=False,
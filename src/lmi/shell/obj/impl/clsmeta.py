@@ -0,0 +1,181 @@
+from collections import namedtuple
+
+from lmi.shell import obj
+from lmi.shell.core import wbem
+from lmi.shell.core.cache import nocase_name
+from lmi.shell.util import cast, transform
+
+
+# Accessor of a property: its name and functions converting its value;
+# get(conn, value) to LMI type, set(value) to CIM type.
+LMIPropertyAccessor = namedtuple('LMIPropertyAccessor', ['name', 'get', 'set'])
+
+
+class LMIClassMetadata(object):
+    '''
+    Metadata of a CIM class used by attribute resolution of instances and by
+    method calls: property types, methods, their parameter types and
+    valuemaps. Objects are shared by all instances of the class within a
+    connection; see :py:func:`class_metadata`.
+
+    :param CIMClass cim_class: class fetched with qualifiers and inherited
+        members
+    '''
+    def __init__(self, cim_class):
+        self.cim_class = cim_class
+        self.classname = cim_class.classname
+        self.property_names = cim_class.properties.keys()
+        self.property_types = dict(
+            (nocase_name(name), prop.type)
+            for name, prop in cim_class.properties.iteritems())
+        self.method_names = cim_class.methods.keys()
+        self.methods = dict(
+            (nocase_name(name), method)
+            for name, method in cim_class.methods.iteritems())
+        self.param_types = dict(
+            (nocase_name(name), dict(
+                (nocase_name(param_name), param.type)
+                for param_name, param in method.parameters.iteritems()))
+            for name, method in cim_class.methods.iteritems())
+        self.valuemaps = {}
+
+    def __repr__(self):
+        return '%s(classname=\'%s\', ...)' % (
+            self.__class__.__name__, self.classname)
+
+    def has_property(self, name):
+        return nocase_name(name) in self.property_types
+
+    def has_method(self, name):
+        return nocase_name(name) in self.methods
+
+    def property_type(self, name):
+        '''
+        Returns CIM type of a property; None, if there is no such property.
+        '''
+        return self.property_types.get(nocase_name(name))
+
+    def method(self, name):
+        '''
+        Returns :py:class:`wbem.CIMMethod` of a method.
+
+        :raises: KeyError, if there is no such method
+        '''
+        return self.methods[nocase_name(name)]
+
+    def param_type(self, method_name, param_name):
+        '''
+        Returns CIM type of a method parameter; None, if there is no such
+        parameter.
+        '''
+        params = self.param_types.get(nocase_name(method_name), {})
+        return params.get(nocase_name(param_name))
+
+    def _valuemap(self, key, make):
+        valuemap = self.valuemaps.get(key)
+        if valuemap is None:
+            valuemap = self.valuemaps[key] = make()
+        return valuemap
+
+    def property_values(self, name):
+        '''
+        Returns :py:class:`.LMIConstantValuesParamProp` of a property.
+        '''
+        return self._valuemap(
+            ('property', nocase_name(name)),
+            lambda: obj.LMIConstantValuesParamProp(
+                self.cim_class.properties[name]))
+
+    def parameter_values(self, method_name, param_name):
+        '''
+        Returns :py:class:`.LMIConstantValuesParamProp` of a method parameter.
+        '''
+        return self._valuemap(
+            ('parameter', nocase_name(method_name), nocase_name(param_name)),
+            lambda: obj.LMIConstantValuesParamProp(
+                self.method(method_name).parameters[param_name]))
+
+    def return_values(self, method_name):
+        '''
+        Returns :py:class:`.LMIConstantValuesMethodReturnType` of a method.
+        '''
+        return self._valuemap(
+            ('return', nocase_name(method_name)),
+            lambda: obj.LMIConstantValuesMethodReturnType(
+                self.method(method_name)))
+
+
+def class_metadata(conn, classname, namespace=None):
+    '''
+    Returns :py:class:`LMIClassMetadata` of a class. Metadata are kept per
+    connection, so the class is fetched only once.
+
+    :param conn: :py:class:`.LMIConnection` object
+    '''
+    namespace = namespace or wbem.config.DEFAULT_NAMESPACE
+    key = (nocase_name(namespace), nocase_name(classname))
+    metadata = conn.class_metadata.get(key)
+    if metadata is None:
+        cim_class = conn.client.GetClass(
+            classname, namespace, LocalOnly=False, IncludeQualifiers=True)
+        metadata = conn.class_metadata[key] = LMIClassMetadata(cim_class)
+    return metadata
+
+
+def _compile_accessor(prop):
+    '''
+    Returns :py:class:`LMIPropertyAccessor` of a :py:class:`wbem.CIMProperty`.
+    '''
+    if prop.type == 'reference':
+        get = transform.to_lmi
+    else:
+        to_lmi = cast.lmi_converter(prop.type)
+        get = lambda conn, value: to_lmi(value)
+    return LMIPropertyAccessor(prop.name, get, cast.cim_converter(prop.type))
+
+
+class LMIPropertyAccessors(object):
+    '''
+    Table of property accessors of a CIM class. It is compiled from
+    properties of the first instance of the class seen; property names are
+    looked up as spelled by user, so each spelling is resolved once.
+
+    :param CIMInstance cim_inst: instance of the class
+    '''
+    def __init__(self, cim_inst):
+        self.accessors = {}
+        for prop in cim_inst.properties.itervalues():
+            self.accessors[prop.name] = _compile_accessor(prop)
+
+    def accessor(self, attr, properties):
+        '''
+        Returns :py:class:`LMIPropertyAccessor` of a property.
+
+        :param string attr: property name in any case
+        :param properties: properties of an instance, which contain attr;
+            used for properties missing in the table
+        '''
+        try:
+            return self.accessors[attr]
+        except KeyError:
+            accessor = _compile_accessor(properties[attr])
+            self.accessors[attr] = self.accessors[accessor.name] = accessor
+            return accessor
+
+
+def property_accessors(conn, cim_inst):
+    '''
+    Returns :py:class:`LMIPropertyAccessors` of instance's class. Tables are
+    kept per connection.
+
+    :param conn: :py:class:`.LMIConnection` object
+    '''
+    namespace = cim_inst.path.namespace if cim_inst.path else None
+    key = (
+        nocase_name(namespace or wbem.config.DEFAULT_NAMESPACE),
+        nocase_name(cim_inst.classname))
+    accessors = conn.property_accessors.get(key)
+    if accessors is None:
+        accessors = conn.property_accessors[key] = \
+            LMIPropertyAccessors(cim_inst)
+    return accessors
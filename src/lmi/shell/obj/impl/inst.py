@@ -1,14 +1,42 @@
 from instbase import LMIInstanceBase  # TODO: import from obj?
 from lmi.shell import obj
-from lmi.shell.util import cast, transform
+from lmi.shell.core import wbem
+from clsmeta import property_accessors
 
 
 class LMIInstance(LMIInstanceBase):
     '''
     LMI class representing CIM Instance.
+
+    Instances returned by enumerations with PropertyList projection (see
+    :py:mod:`lmi.shell.util.projection`) fetch properties, which were left
+    out, on first access.
+
+    Properties set through attributes are recorded, so :py:meth:`push` sends
+    just the modified ones. Values read through attributes are cast once and
+    remembered until a property is set, or the instance is refreshed.
+    Changes made directly to the wrapped :py:class:`wbem.CIMInstance` are
+    neither recorded, nor seen by remembered values.
     '''
-    def __init__(self, conn, cim_inst):
+    __slots__ = ('_projection', '_partial', '_dirty', '_accessors', '_values')
+
+    _SLOTS = LMIInstanceBase._SLOTS.union(__slots__)
+
+    def __init__(self, conn, cim_inst, projection=None):
         super(LMIInstance, self).__init__(conn, cim_inst)
+        init_slot = object.__setattr__
+        # Projection of the enumeration, which returned the instance.
+        init_slot(self, '_projection', projection)
+        # True, if some properties were left out by the projection.
+        init_slot(
+            self, '_partial', projection is not None and projection.partial)
+        # Names of properties modified since last push or refresh.
+        init_slot(self, '_dirty', set())
+        # Property accessors of instance's class; see clsmeta.
+        init_slot(self, '_accessors', None)
+        # Cast values of read properties by attribute names; arrays are not
+        # kept, so their modifications by user don't leak into next reads.
+        init_slot(self, '_values', None)
 
     def __cmp__(self, other):
         if not isinstance(other, LMIInstance):
@@ -16,28 +44,55 @@ class LMIInstance(LMIInstanceBase):
         return cmp(self.cim_inst, other.cim_inst)
 
     def __contains__(self, key):
-        return key in self.cim_inst
+        if key in self.cim_inst:
+            return True
+        return self._partial and self._is_property(key)
 
     def __getattr__(self, attr):
-        if attr in self.cim_inst:
-            member = self.cim_inst.properties[attr]
-            if isinstance(member.value, wbem.CIMInstanceName):
-                return transform.to_lmi(self._conn, member.value)
-            return cast.to_lmi(member.type, member.value)
-        elif not self.conn.is_wsman() and attr in self.methods:
-            return obj.LMIMethod(self.conn, attr, self.path.wrapped_object)
-        elif self.conn.is_wsman() and not attr.startswith("_"):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        values = self._values
+        if values is not None and attr in values:
+            return values[attr]
+        if self._extra is not None and attr in self._extra:
+            return self._extra[attr]
+        if self._partial and attr not in self.cim_obj and \
+                self._is_property(attr):
+            self._fetch_missing()
+        if attr in self.cim_obj:
+            if self._projection is not None:
+                self._projection.touch(attr)
+            properties = self.cim_obj.properties
+            accessor = self._accessor(attr)
+            value = accessor.get(self.conn, properties[accessor.name].value)
+            if not isinstance(value, list):
+                if values is None:
+                    values = self._values = {}
+                values[attr] = value
+            return value
+        elif not self.conn.is_wsman() and \
+                self._class_metadata().has_method(attr):
+            return obj.LMIMethod(self.conn, attr, self.cim_inst.path)
+        elif self.conn.is_wsman():
             return obj.LMIMethod(self.conn, attr, self.path.wrapped_object)
         raise AttributeError(attr)
 
     def __setattr__(self, attr, value):
+        if attr in self._SLOTS:
+            object.__setattr__(self, attr, value)
+            return
         if isinstance(value, obj.LMIInstanceName):
             value = value.wrapped_object
-        if attr in self.cim_inst:
-            t = self.cim_inst.properties[attr].type
-            self.cim_inst.properties[attr].value = cast.to_cim(t, value)
+        if self._partial and attr not in self.cim_inst and \
+                self._is_property(attr):
+            self._fetch_missing()
+        if attr in self.cim_obj:
+            accessor = self._accessor(attr)
+            self.cim_obj.properties[accessor.name].value = accessor.set(value)
+            self._dirty.add(accessor.name.lower())
+            self._values = None
         else:
-            self.__dict__[attr] = value
+            self._set_extra(attr, value)
 
     def __str__(self):
         return unicode(self).encode('utf-8')
@@ -49,30 +104,100 @@ class LMIInstance(LMIInstanceBase):
         return '%s(classname=\'%s\', ...)' % (
             self.__class__.__name__, self.classname)
 
+    def _accessor(self, attr):
+        '''
+        Returns :py:class:`.LMIPropertyAccessor` of a property present in the
+        wrapped instance.
+        '''
+        if self._accessors is None:
+            self._accessors = property_accessors(self.conn, self.cim_obj)
+        return self._accessors.accessor(attr, self.cim_obj.properties)
+
+    def _is_property(self, attr):
+        '''
+        Returns True, if attr is a property of instance's class.
+        '''
+        if attr.startswith('_'):
+            return False
+        return self._class_metadata().has_property(attr)
+
+    def _fetch_missing(self):
+        '''
+        Fetches properties left out by the projection. Properties already
+        present are kept, so local modifications are not lost.
+        '''
+        cim_inst = self.conn.client.GetInstance(self.cim_inst.path)
+        properties = self.cim_inst.properties
+        for name, prop in cim_inst.properties.iteritems():
+            if name not in properties:
+                properties[name] = prop
+        self._partial = False
+
     def copy(self):
-        return obj.LMIInstance(self.conn, self.cim_inst.copy())
+        inst = obj.LMIInstance(
+            self.conn, self.cim_inst.copy(), self._projection)
+        inst._partial = self._partial
+        inst._dirty = set(self._dirty)
+        return inst
 
     def doc(self):
         raise NotImplementedError('doc')
 
     def tomof(self):
+        if self._partial:
+            self._fetch_missing()
         return self.cim_inst.tomof()
 
     def property_value(self, prop_name):
         return getattr(self, prop_name)
 
     def push(self):
-        self.conn.client.ModifyInstance(self.cim_inst)
+        '''
+        Sends modified properties to CIMOM. If no property was modified, no
+        request is made.
+
+        :returns: True, if the instance was modified on CIMOM
+        '''
+        return self._push(self.conn.client)
+
+    def _push(self, client):
+        if not self._dirty:
+            return False
+        properties = self.cim_inst.properties
+        modified = wbem.CIMInstance(
+            self.cim_inst.classname,
+            properties=dict(
+                (name, properties[name]) for name in self.modified_properties),
+            path=self.cim_inst.path)
+        client.ModifyInstance(
+            modified, PropertyList=self.modified_properties)
+        self._dirty.clear()
+        return True
+
+    @property
+    def modified_properties(self):
+        '''
+        :returns: names of properties modified since last push or refresh
+        '''
+        properties = self.cim_inst.properties
+        return sorted(properties[name].name for name in self._dirty)
 
     def refresh(self):
-        self.cim_inst = self.conn.client.GetInstance(self.cim_inst.path)
+        self.cim_obj = self.conn.client.GetInstance(self.cim_inst.path)
+        self._partial = False
+        self._dirty.clear()
+        self._values = None
 
     @property
     def properties(self):
+        if self._partial:
+            self._fetch_missing()
         return self.cim_inst.properties.keys()
 
     @property
     def properties_dict(self):
+        if self._partial:
+            self._fetch_missing()
         props = self.cim_inst.properties
         return wbem.NocaseDict(
             dict((k, x.value) for k, x in props.iteritems()))
@@ -1,19 +1,37 @@
 from lmi.shell import obj, util
 from lmi.shell.core import enum, wbem
-from lmi.shell.util import meta, transform
+from lmi.shell.util import projection, transform
+from clsmeta import class_metadata
 
 
 class LMIInstanceBase(obj.LMIBase):
     '''
     Base class for :py:class:`.LMIInstance` and :py:class:`.LMIInstanceName`.
+
+    Wrappers are created for every enumerated object, so they keep their
+    state in slots instead of a per-object __dict__. Other attributes are
+    CIM properties (keys) of the wrapped object; attributes set by user,
+    which are not, are kept in a dictionary created on demand.
     '''
-    __metaclass__ = meta.SetAttrMeta
+    __slots__ = ('cim_obj', '_metadata', '_extra')
+
+    # Attributes stored in slots; subclasses with own slots extend this.
+    _SLOTS = frozenset(('conn', ) + __slots__)
 
     def __init__(self, conn, cim_obj):
-        super(LMIInstanceBase, self).__init__(conn)
         if not isinstance(cim_obj, (wbem.CIMInstance, wbem.CIMInstanceName)):
             raise TypeError('cim_obj must be CIMInstance(Name) type')
-        self.cim_obj = cim_obj
+        # Slots are set directly, bypassing __setattr__ of subclasses.
+        init_slot = object.__setattr__
+        init_slot(self, 'conn', conn)
+        init_slot(self, 'cim_obj', cim_obj)
+        init_slot(self, '_metadata', None)
+        init_slot(self, '_extra', None)
+
+    def _set_extra(self, attr, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[attr] = value
 
     def associator_names(self, limit=-1, AssocClass=None, ResultClass=None,
                          Role=None, ResultRole=None):
@@ -38,6 +56,11 @@ class LMIInstanceBase(obj.LMIBase):
     def associators(self, limit=-1, AssocClass=None, ResultClass=None,
                     Role=None, ResultRole=None, IncludeQualifiers=False,
                     IncludeClassOrigin=False, PropertyList=None):
+        PropertyList, proj = projection.resolve(
+            self.conn, PropertyList,
+            projection.key(
+                'associators', self.namespace, self.classname, AssocClass,
+                ResultClass, Role, ResultRole))
         op = enum.OPAssociators(
             transform.to_cim_path(self.cim_obj),
             namespace=self.namespace, AssocClass=AssocClass,
@@ -48,7 +71,7 @@ class LMIInstanceBase(obj.LMIBase):
         enumerator = enum.Enumerator(self.conn.client)
         enumerator.set_operation(op)
         for assoc in enumerator:
-            yield obj.LMIInstance(self.conn, assoc)
+            yield obj.LMIInstance(self.conn, assoc, proj)
 
     def first_associators(self, AssocClass=None, ResultClass=None, Role=None,
                           ResultRole=None, IncludeQualifiers=False,
@@ -79,6 +102,11 @@ class LMIInstanceBase(obj.LMIBase):
     def references(self, limit=-1, ResultClass=None, Role=None,
                    IncludeQualifiers=False, IncludeClassOrigin=False,
                    PropertyList=None):
+        PropertyList, proj = projection.resolve(
+            self.conn, PropertyList,
+            projection.key(
+                'references', self.namespace, self.classname, ResultClass,
+                Role))
         op = enum.OPReferences(
             transform.to_cim_path(self.cim_obj),
             namespace=self.namespace, ResultClass=ResultClass, Role=Role,
@@ -88,7 +116,7 @@ class LMIInstanceBase(obj.LMIBase):
         enumerator = enum.Enumerator(self.conn.client)
         enumerator.set_operation(op)
         for ref in enumerator:
-            yield obj.LMIInstance(self.conn, ref)
+            yield obj.LMIInstance(self.conn, ref, proj)
 
     def first_reference(self, ResultClass=None, Role=None,
                    IncludeQualifiers=False, IncludeClassOrigin=False,
@@ -102,11 +130,20 @@ class LMIInstanceBase(obj.LMIBase):
                 PropertyList=PropertyList))
 
     def delete(self):
-        self.conn.client.DeleteInstancee(transform.to_cim_path(self.cim_obj))
+        self.conn.client.DeleteInstance(transform.to_cim_path(self.cim_obj))
+
+    def _class_metadata(self):
+        '''
+        Returns :py:class:`.LMIClassMetadata` of instance's class.
+        '''
+        if self._metadata is None:
+            self._metadata = class_metadata(
+                self.conn, self.classname, self.namespace)
+        return self._metadata
 
     @property
     def methods(self):
-        return obj.LMIClass(self.conn, self.classname).methods
+        return self._class_metadata().method_names
 
     @property
     def classname(self):
@@ -1,5 +1,6 @@
 from instbase import LMIInstanceBase  # TODO: import from obj?
 from lmi.shell import obj
+from lmi.shell.core import wbem
 from lmi.shell.util import transform
 
 
@@ -7,6 +8,8 @@ class LMIInstanceName(LMIInstanceBase):
     '''
     LMI class representing CIM Instance Name.
     '''
+    __slots__ = ()
+
     def __init__(self, conn, cim_inst_name):
         super(LMIInstanceName, self).__init__(conn, cim_inst_name)
 
@@ -19,19 +22,26 @@ class LMIInstanceName(LMIInstanceBase):
         return key in self.cim_inst_name
 
     def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if self._extra is not None and attr in self._extra:
+            return self._extra[attr]
         if attr in self.cim_inst_name:
             member = self.cim_inst_name[attr]
             if isinstance(member, wbem.CIMInstanceName):
                 member = transform.to_lmi(self.conn, member)
             return member
-        elif not self.conn.is_wsman() and attr in self.methods:
+        elif not self.conn.is_wsman() and \
+                self._class_metadata().has_method(attr):
             return obj.LMIMethod(self.conn, attr, self.cim_inst_name)
-        elif self.conn.is_wsman() and not attr.startswith("_"):
+        elif self.conn.is_wsman():
             return obj.LMIMethod(self.conn, attr, self.cim_inst_name)
         raise AttributeError(attr)
 
     def __setattr__(self, attr, value):
-        if attr in self.cim_inst_name.keys():  # TODO: remove '.keys()'?
+        if attr in self._SLOTS:
+            object.__setattr__(self, attr, value)
+        elif attr in self.cim_inst_name.keys():  # TODO: remove '.keys()'?
             if isinstance(value, str):
                 # Convert string value into unicode
                 value = unicode(value, "utf-8")
@@ -40,7 +50,7 @@ class LMIInstanceName(LMIInstanceBase):
                 value = value.wrapped_object
             self.cim_inst_name[attr] = value
         else:
-            self.__dict__[attr] = value
+            self._set_extra(attr, value)
 
     def __str__(self):
         return unicode(self).encode('utf-8')
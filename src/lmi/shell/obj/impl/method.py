@@ -1,5 +1,6 @@
 from lmi.shell import exc, obj
 from lmi.shell.util import transform
+from clsmeta import class_metadata
 
 
 class LMIMethod(obj.LMIBase):
@@ -33,39 +34,47 @@ class LMIMethod(obj.LMIBase):
     def __call__(self, method_args=None, polling=False, refresh_instance=False,
                  **kwargs):
         # Prepare method parameters.
-        method_args = self.make_method_args(method_args)
+        method_args = self.make_method_args(method_args, **kwargs)
 
         # Call the CIM method.
-        rval, rparams = client.InvokeMethod(
-            self.cim_instance,
-            self_method_name,
+        rval, rparams = self.conn.client.InvokeMethod(
+            self.method_name,
+            self.cim_inst_name,
             **method_args)
 
         # Transform method results.
-        rval = transform.to_lmi(self.conn, rval)
+        return (
+            transform.to_lmi(self.conn, rval),
+            transform.to_lmi(self.conn, rparams))
 
     def make_method_args(self, method_args=None, **kwargs):
         if method_args is None:
             method_args = dict()
         method_args.update(kwargs)
         if not self.conn.is_wsman():
+            metadata = self.class_metadata
             for param, value in method_args.iteritems():
-                if param in self.cim_method.parameters:
+                t = metadata.param_type(self.method_name, param)
+                if t is not None:
                     # Cast input parameters into acceptable CIM types
-                    t = self.cim_method.parameters[param].type
                     method_args[param] = transform.to_cim_param(t, value)
                 else:
                     # NOTE: maybe we could check for wbem type and not to exit
                     # prematurely
                     raise exc.LMIUnknownParameterError(
                         'Unknown parameter \'%s\' for method \'%s\'' % (
-                            param, self.method_name)
+                            param, self.method_name))
         else:
             for param, value in method_args.iteritems():
                 method_args[param] = str(value)
         return method_args
 
+    @property
+    def class_metadata(self):
+        return class_metadata(
+            self.conn, self.cim_inst_name.classname,
+            self.cim_inst_name.namespace)
+
     @property
     def cim_method(self):
-        lmi_cls = obj.LMIClass(self.conn, self.cim_inst_name.classname)
-        return lmi_cls.cim_cl.methods[self.method_mane]
+        return self.class_metadata.method(self.method_name)
@@ -1,10 +1,16 @@
+from collections import namedtuple
 from lmi.shell import obj
+from lmi.shell.util import parallel
 
 
 QUERY_TYPE_CQL = 'DMTF:CQL'
 QUERY_TYPE_WQL = 'WQL'
 
 
+# Result of a multi-class enumeration; either instance, or error is set.
+LMIClassResult = namedtuple('LMIClassResult', ['classname', 'instance', 'error'])
+
+
 class LMINamespace(obj.LMIBase):
     '''
     LMI class representing CIM namespace.
@@ -53,6 +59,32 @@ class LMINamespace(obj.LMIBase):
         return self.conn.client.EnumerateClassNames(
             self.name, DeepInheritance=DeepInheritance)
 
+    def instances_of(self, classes, workers=parallel.DEFAULT_WORKERS,
+                     **kwargs):
+        '''
+        Enumerates instances of several classes concurrently; each class is
+        enumerated over a client from the connection's pool. Yields
+        :py:class:`LMIClassResult` objects as the instances arrive. If an
+        enumeration fails, one result with the error is yielded for the class
+        and other classes are not affected.
+
+        :param classes: class names or :py:class:`.LMIClass` objects
+        :param int workers: number of concurrent enumerations
+        :param kwargs: arguments of :py:meth:`.LMIClass.instances`
+        '''
+        client_pool = self.conn.client_pool(workers)
+
+        def enumerate_class(classname):
+            with client_pool.client() as client:
+                cls = obj.LMIClass(self.conn, classname, self.name)
+                for inst in cls._instances(client, **kwargs):
+                    yield inst
+
+        classnames = [getattr(c, 'classname', c) for c in classes]
+        results = parallel.stream(enumerate_class, classnames, workers)
+        for classname, inst, error in results:
+            yield LMIClassResult(classname, inst, error)
+
     def get_class(self, classname, LocalOnly=True, IncludeQualifiers=True,
             IncludeClassOrigin=False, PropertyList=None):
         cim_class = self.conn.client.GetClass(
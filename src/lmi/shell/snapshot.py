@@ -0,0 +1,605 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Offline snapshots of instances. Instances of selected classes are captured
+from a connection into a SQLite database and can be queried later without
+CIMOM, through a read-only view similar to :py:class:`.LMINamespace`. Key
+properties (and other selected properties) are indexed, so filtered queries
+don't decode all the instances of a class.
+
+Example of usage:
+
+    snap = take_snapshot(conn, 'host1.db', ['LMI_Account', 'LMI_Group'])
+    ...
+    snap = LMISnapshot('host1.db')
+    for account in snap.root.cimv2.LMI_Account.instances({'Name': 'root'}):
+        print account.UserID
+'''
+
+__all__ = [
+    'LMISnapshot',
+    'take_snapshot',
+]
+
+import json
+import sqlite3
+import threading
+import time
+
+from lmi.shell import exc, obj
+from lmi.shell.core import wbem
+from lmi.shell.core.cache import path_key
+from lmi.shell.util import cast, columns, export, parallel, query
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS classes (
+    namespace TEXT COLLATE NOCASE,
+    classname TEXT COLLATE NOCASE,
+    properties TEXT,
+    indexed TEXT,
+    captured REAL,
+    PRIMARY KEY (namespace, classname));
+CREATE TABLE IF NOT EXISTS instances (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT COLLATE NOCASE,
+    enum_class TEXT COLLATE NOCASE,
+    path TEXT,
+    data TEXT,
+    UNIQUE (namespace, enum_class, path));
+CREATE INDEX IF NOT EXISTS instances_path ON instances (path);
+CREATE TABLE IF NOT EXISTS keys (
+    instance INTEGER,
+    name TEXT COLLATE NOCASE,
+    value TEXT);
+CREATE INDEX IF NOT EXISTS keys_value ON keys (name, value);
+CREATE INDEX IF NOT EXISTS keys_instance ON keys (instance);
+'''
+
+# Number of rows fetched from the database at once.
+_FETCH_SIZE = 256
+
+
+def _encode_value(value):
+    '''
+    Returns a JSON serializable form of a property or key value. Datetimes
+    and embedded objects are stored as strings.
+    '''
+    if value is None or isinstance(value, (bool, basestring)):
+        return value
+    elif isinstance(value, (int, long)):
+        return int(value)
+    elif isinstance(value, float):
+        return float(value)
+    elif isinstance(value, list):
+        return [_encode_value(v) for v in value]
+    elif isinstance(value, wbem.CIMInstanceName):
+        return {'path': _encode_path(value)}
+    return unicode(value)
+
+
+def _decode_value(t, value):
+    if isinstance(value, list):
+        return [_decode_value(t, v) for v in value]
+    elif isinstance(value, dict):
+        return _decode_path(value['path'])
+    elif value is None or t is None:
+        return value
+    elif t == 'datetime':
+        return wbem.CIMDateTime(value)
+    return cast.to_cim(t, value)
+
+
+def _encode_path(path, namespace=None):
+    return {
+        'classname': path.classname,
+        'namespace': path.namespace or namespace,
+        'host': path.host,
+        'keybindings': dict(
+            (k, _encode_value(v)) for k, v in path.keybindings.iteritems()),
+    }
+
+
+def _decode_path(data):
+    return wbem.CIMInstanceName(
+        data['classname'],
+        keybindings=dict(
+            (k, _decode_value(None, v))
+            for k, v in data['keybindings'].iteritems()),
+        host=data['host'],
+        namespace=data['namespace'])
+
+
+def _path_text(path, namespace=None):
+    '''
+    Returns a case-insensitive text key of an instance path; see
+    :py:func:`.path_key`.
+    '''
+    def plain(key):
+        if isinstance(key, frozenset):
+            return sorted(plain(k) for k in key)
+        elif isinstance(key, tuple):
+            return [plain(k) for k in key]
+        return _encode_value(key)
+    return json.dumps(plain(path_key(path, namespace)))
+
+
+def _key_text(value):
+    '''
+    Returns indexed text of a value; None, if the value is not indexed. Only
+    integers (booleans included) and strings are indexed, so an index lookup
+    finds all the values equal to the searched one.
+    '''
+    if isinstance(value, (int, long)):
+        return str(int(value))
+    elif isinstance(value, basestring):
+        return json.dumps(value)
+    return None
+
+
+def _encode_instance(cim_inst, namespace):
+    return json.dumps({
+        'classname': cim_inst.classname,
+        'path': _encode_path(cim_inst.path, namespace),
+        'properties': [
+            [prop.name, prop.type, prop.is_array, _encode_value(prop.value)]
+            for prop in cim_inst.properties.itervalues()],
+    })
+
+
+def _decode_instance(data):
+    data = json.loads(data)
+    properties = wbem.NocaseDict()
+    for name, t, is_array, value in data['properties']:
+        properties[name] = wbem.CIMProperty(
+            name, _decode_value(t, value), type=t, is_array=is_array)
+    return wbem.CIMInstance(
+        data['classname'], properties=properties,
+        path=_decode_path(data['path']))
+
+
+def take_snapshot(conn, filename, classes, namespace=None, index=None,
+                  workers=parallel.DEFAULT_WORKERS):
+    '''
+    Captures instances of classes into a snapshot file and returns the
+    opened :py:class:`LMISnapshot`; see :py:meth:`LMISnapshot.capture`.
+    '''
+    snapshot = LMISnapshot(filename)
+    snapshot.capture(conn, classes, namespace, index, workers)
+    return snapshot
+
+
+class LMISnapshot(object):
+    '''
+    Snapshot of instances stored in a SQLite database. Namespaces of the
+    snapshot are accessed as attributes, like in :py:class:`.LMIConnection`;
+    instances returned by the snapshot are read-only copies, which don't
+    need CIMOM.
+
+    :param string filename: database file; created, if it doesn't exist
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.executescript(_SCHEMA)
+        self.conn = _LMISnapshotConnection(self)
+
+    def __repr__(self):
+        return '%s(filename=\'%s\')' % (
+            self.__class__.__name__, self.filename)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get_namespace(name)
+
+    @property
+    def namespaces(self):
+        '''
+        :returns: list of namespaces with captured classes
+        '''
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT DISTINCT namespace FROM classes '
+                'WHERE captured IS NOT NULL ORDER BY namespace').fetchall()
+        return [row[0] for row in rows]
+
+    def get_namespace(self, namespace):
+        '''
+        Returns :py:class:`LMISnapshotNamespace` of a namespace, eg.
+        'root/cimv2'.
+
+        :raises: :py:exc:`.LMINamespaceNotFound`
+        '''
+        prefix = namespace.lower()
+        for name in self.namespaces:
+            name = name.lower()
+            if name == prefix or name.startswith(prefix + '/'):
+                return LMISnapshotNamespace(self, namespace)
+        raise exc.LMINamespaceNotFound(namespace)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def capture(self, conn, classes, namespace=None, index=None,
+                workers=parallel.DEFAULT_WORKERS):
+        '''
+        Enumerates instances of classes concurrently and stores them in the
+        snapshot. Instances stored by a previous capture of a class are
+        replaced. If an enumeration fails, nothing is stored and the error
+        is raised.
+
+        :param conn: :py:class:`.LMIConnection` object
+        :param classes: class names or :py:class:`.LMIClass` objects
+        :param string namespace: namespace of the classes; connection's
+            default by default
+        :param index: names of properties indexed together with keys
+        :param int workers: number of concurrent enumerations
+        :returns: dictionary of class names and numbers of stored instances
+        '''
+        namespace = namespace or wbem.config.DEFAULT_NAMESPACE
+        index = set(name.lower() for name in index or [])
+        counts = {}
+        # Indexed properties of captured classes; keys are always indexed.
+        indexed = {}
+        # Property types of classes of the instances by lower-case names.
+        schemas = {}
+
+        results = conn.get_namespace(namespace).instances_of(
+            classes, workers, LocalOnly=False)
+        with self.lock:
+            try:
+                for result in results:
+                    if result.error is not None:
+                        raise result.error
+                    if result.classname not in counts:
+                        self._clear(namespace, result.classname)
+                        counts[result.classname] = 0
+                    cim_inst = result.instance.wrapped_object
+                    keys = indexed.setdefault(result.classname, set(index))
+                    keys.update(
+                        name.lower()
+                        for name in cim_inst.path.keybindings.iterkeys())
+                    self._store(namespace, result.classname, cim_inst, keys)
+                    classname, schema = schemas.setdefault(
+                        cim_inst.classname.lower(), (cim_inst.classname, {}))
+                    for prop in cim_inst.properties.itervalues():
+                        schema[prop.name] = [prop.type, prop.is_array]
+                    counts[result.classname] += 1
+
+                now = time.time()
+                for classname in classes:
+                    classname = getattr(classname, 'classname', classname)
+                    if classname not in counts:
+                        # Class without instances.
+                        self._clear(namespace, classname)
+                        counts[classname] = 0
+                    # Prefer the class name as spelled by CIMOM.
+                    name, schema = schemas.pop(
+                        classname.lower(), (classname, {}))
+                    self._store_class(
+                        namespace, name, schema,
+                        indexed.get(classname, index), now)
+                for classname, schema in schemas.itervalues():
+                    self._store_class(namespace, classname, schema)
+            except:
+                self.db.rollback()
+                raise
+            self.db.commit()
+        return counts
+
+    def _clear(self, namespace, classname):
+        self.db.execute(
+            'DELETE FROM keys WHERE instance IN ('
+            'SELECT id FROM instances WHERE namespace = ? AND enum_class = ?)',
+            (namespace, classname))
+        self.db.execute(
+            'DELETE FROM instances WHERE namespace = ? AND enum_class = ?',
+            (namespace, classname))
+
+    def _store(self, namespace, classname, cim_inst, indexed):
+        '''
+        Stores an instance; indexed are lower-case names of properties to
+        index.
+        '''
+        cursor = self.db.execute(
+            'INSERT OR REPLACE INTO instances '
+            '(namespace, enum_class, path, data) VALUES (?, ?, ?, ?)',
+            (namespace, classname, _path_text(cim_inst.path, namespace),
+             _encode_instance(cim_inst, namespace)))
+
+        values = {}
+        for prop in cim_inst.properties.itervalues():
+            name = prop.name.lower()
+            if name in indexed:
+                values[name] = prop.value
+        for name, value in cim_inst.path.keybindings.iteritems():
+            values.setdefault(name.lower(), value)
+        rows = []
+        for name, value in values.iteritems():
+            text = _key_text(value)
+            if text is not None:
+                rows.append((cursor.lastrowid, name, text))
+        self.db.executemany(
+            'INSERT INTO keys (instance, name, value) VALUES (?, ?, ?)', rows)
+
+    def _store_class(self, namespace, classname, schema, indexed=None,
+                     captured=None):
+        '''
+        Stores property types of a class. Captured classes are stored with
+        indexed properties and time of the capture; classes of their
+        instances without them.
+        '''
+        row = self.db.execute(
+            'SELECT properties, indexed, captured FROM classes '
+            'WHERE namespace = ? AND classname = ?',
+            (namespace, classname)).fetchone()
+        if row is not None:
+            properties = json.loads(row[0])
+            properties.update(schema)
+            schema = properties
+            if captured is None:
+                indexed, captured = json.loads(row[1] or 'null'), row[2]
+        self.db.execute(
+            'INSERT OR REPLACE INTO classes '
+            '(namespace, classname, properties, indexed, captured) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (namespace, classname, json.dumps(schema),
+             json.dumps(sorted(indexed)) if indexed is not None else None,
+             captured))
+
+    def _fetch(self, sql, args):
+        '''
+        Yields rows of a query. Rows are fetched in batches, so the lock is
+        not held, while the caller processes them.
+        '''
+        with self.lock:
+            cursor = self.db.execute(sql, args)
+            rows = cursor.fetchmany(_FETCH_SIZE)
+        while rows:
+            for row in rows:
+                yield row
+            with self.lock:
+                rows = cursor.fetchmany(_FETCH_SIZE)
+
+    def classes(self, namespace):
+        '''
+        :returns: list of classes captured in a namespace
+        '''
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT classname FROM classes WHERE namespace = ? AND '
+                'captured IS NOT NULL ORDER BY classname',
+                (namespace, )).fetchall()
+        return [row[0] for row in rows]
+
+    def get_class(self, namespace, classname):
+        '''
+        Returns :py:class:`wbem.CIMClass` with properties seen in captured
+        instances of a class; it has no methods, nor qualifiers.
+
+        :raises: :py:exc:`.LMIClassNotFound`
+        '''
+        with self.lock:
+            row = self.db.execute(
+                'SELECT classname, properties FROM classes '
+                'WHERE namespace = ? AND classname = ?',
+                (namespace, classname)).fetchone()
+        if row is None:
+            raise exc.LMIClassNotFound(namespace, classname)
+        properties = wbem.NocaseDict()
+        for name, (t, is_array) in json.loads(row[1]).iteritems():
+            properties[name] = wbem.CIMProperty(
+                name, None, type=t, is_array=is_array)
+        return wbem.CIMClass(row[0], properties=properties)
+
+    def get_instance(self, path):
+        '''
+        Returns :py:class:`wbem.CIMInstance` of a path; None, if it is not in
+        the snapshot. Paths without a namespace are looked up in the default
+        one.
+        '''
+        path_text = _path_text(
+            path, path.namespace or wbem.config.DEFAULT_NAMESPACE)
+        for row in self._fetch(
+                'SELECT data FROM instances WHERE path = ? LIMIT 1',
+                (path_text, )):
+            return _decode_instance(row[0])
+        return None
+
+    def instances(self, namespace, classname, inst_filter=None, limit=-1):
+        '''
+        Yields :py:class:`wbem.CIMInstance` objects captured by enumeration
+        of a class, which match inst_filter. Conditions on indexed
+        properties are evaluated by the database.
+        '''
+        with self.lock:
+            row = self.db.execute(
+                'SELECT indexed FROM classes WHERE namespace = ? AND '
+                'classname = ? AND captured IS NOT NULL',
+                (namespace, classname)).fetchone()
+        if row is None:
+            raise exc.LMIClassNotFound(namespace, classname)
+        indexed = set(json.loads(row[0] or '[]'))
+
+        sql = 'SELECT data FROM instances WHERE namespace = ? AND ' \
+            'enum_class = ?'
+        args = [namespace, classname]
+        inst_query = query.Query(inst_filter)
+        for name, value in inst_query.conditions:
+            text = _key_text(value)
+            if text is None or name.lower() not in indexed:
+                continue
+            sql += ' AND id IN (SELECT instance FROM keys ' \
+                'WHERE name = ? AND value = ?)'
+            args.extend([name, text])
+        sql += ' ORDER BY id'
+
+        cnt = 0
+        for row in self._fetch(sql, args):
+            if limit != -1 and cnt >= limit:
+                break
+            cim_inst = _decode_instance(row[0])
+            if inst_query and not inst_query.match(cim_inst):
+                continue
+            cnt += 1
+            yield cim_inst
+
+
+class LMISnapshotNamespace(object):
+    '''
+    Read-only view of a namespace of a snapshot. Captured classes are
+    accessed as attributes.
+    '''
+    def __init__(self, snapshot, name):
+        self.snapshot = snapshot
+        self.name = name
+
+    def __repr__(self):
+        return '%s(namespace=\'%s\', ...)' % (
+            self.__class__.__name__, self.name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        prefix = (self.name + '/' + name).lower()
+        for namespace in self.snapshot.namespaces:
+            namespace = namespace.lower()
+            if namespace == prefix or namespace.startswith(prefix + '/'):
+                return LMISnapshotNamespace(
+                    self.snapshot, self.name + '/' + name)
+        if name.lower() not in (c.lower() for c in self.classes()):
+            raise exc.LMIClassNotFound(self.name, name)
+        return LMISnapshotClass(self.snapshot, self.name, name)
+
+    def __iter__(self):
+        for cls in self.classes():
+            yield cls
+
+    def classes(self):
+        return self.snapshot.classes(self.name)
+
+
+class LMISnapshotClass(object):
+    '''
+    Read-only view of instances of a class captured in a snapshot. Returned
+    :py:class:`.LMIInstance` and :py:class:`.LMIInstanceName` objects read
+    properties and instances from the snapshot; operations, which need
+    CIMOM, raise :py:exc:`.LMISnapshotError`.
+    '''
+    def __init__(self, snapshot, namespace, classname):
+        self.snapshot = snapshot
+        self.namespace = namespace
+        self.classname = classname
+
+    def __repr__(self):
+        return '%s(classname=\'%s\', ...)' % (
+            self.__class__.__name__, self.classname)
+
+    def __iter__(self):
+        for inst_name in self.instance_names():
+            yield inst_name
+
+    def _cim_instances(self, inst_filter=None, limit=-1):
+        return self.snapshot.instances(
+            self.namespace, self.classname, inst_filter, limit)
+
+    def instances(self, inst_filter=None, limit=-1):
+        for cim_inst in self._cim_instances(inst_filter, limit):
+            yield obj.LMIInstance(self.snapshot.conn, cim_inst)
+
+    def first_instance(self, inst_filter=None):
+        for inst in self.instances(inst_filter, limit=1):
+            return inst
+        return None
+
+    def instance_names(self, inst_filter=None, limit=-1):
+        for cim_inst in self._cim_instances(inst_filter, limit):
+            yield obj.LMIInstanceName(self.snapshot.conn, cim_inst.path)
+
+    def first_instance_name(self, inst_filter=None):
+        for inst_name in self.instance_names(inst_filter, limit=1):
+            return inst_name
+        return None
+
+    def count(self, inst_filter=None):
+        return sum(1 for cim_inst in self._cim_instances(inst_filter))
+
+    def columns(self, inst_filter=None, limit=-1, PropertyList=None):
+        '''
+        Returns :py:class:`.LMIColumns` of captured instances.
+        '''
+        cols = columns.LMIColumns(PropertyList)
+        cols.extend(self._cim_instances(inst_filter, limit))
+        return cols
+
+    def export(self, output, fmt=None, PropertyList=None, compress=None,
+               inst_filter=None, limit=-1):
+        '''
+        Writes captured instances into a file; see :py:func:`.export.export`.
+        '''
+        return export.export(
+            self._cim_instances(inst_filter, limit), output, fmt,
+            PropertyList, compress)
+
+
+class _LMISnapshotConnection(object):
+    '''
+    Connection used by LMI objects returned by a snapshot.
+    '''
+    def __init__(self, snapshot):
+        self.client = _LMISnapshotClient(snapshot)
+        self.class_metadata = {}
+        self.property_accessors = {}
+
+    def __repr__(self):
+        return '%s(%s)' % (
+            self.__class__.__name__, repr(self.client.snapshot))
+
+    def is_wsman(self):
+        return False
+
+
+class _LMISnapshotClient(object):
+    '''
+    Client serving GetInstance and GetClass from a snapshot; other
+    operations raise :py:exc:`.LMISnapshotError`.
+    '''
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def unsupported(*args, **kwargs):
+            raise exc.LMISnapshotError(
+                '%s is not available in a snapshot' % name)
+        return unsupported
+
+    def GetInstance(self, path, *args, **kwargs):
+        cim_inst = self.snapshot.get_instance(path)
+        if cim_inst is None:
+            raise exc.CIMError(
+                wbem.CIM_ERR_NOT_FOUND, 'Instance not found in snapshot')
+        return cim_inst
+
+    def GetClass(self, classname, namespace=None, *args, **kwargs):
+        return self.snapshot.get_class(
+            namespace or wbem.config.DEFAULT_NAMESPACE, classname)
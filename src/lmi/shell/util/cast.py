@@ -1,52 +1,139 @@
 from lmi.shell.core import wbem
 
 
-def _do_cast(t, value, cast):
+def _identity(x):
+    return x
+
+
+def _to_unicode(x):
+    return unicode(x, 'utf-8') if isinstance(x, str) else x
+
+
+def _to_path(x):
+    '''
+    Returns :py:class:`wbem.CIMInstanceName` of an (LMI) instance; x
+    otherwise.
+    '''
+    x = getattr(x, 'wrapped_object', x)
+    if isinstance(x, wbem.CIMInstance):
+        return x.path
+    return x
+
+
+def _compile(scalar, strict=False):
     '''
-    Helper function, which preforms the actual cast.
+    Returns a converter of values of one CIM type. Scalars are passed to
+    scalar; arrays, tuples and dictionaries (and their subclasses) are
+    converted member by member. If scalar is strict, it raises TypeError or
+    ValueError for None and containers, so arrays can be converted by map()
+    first.
     '''
-    cast_func = cast.get(t.lower(), lambda x: x)
-    if isinstance(value, (dict, wbem.NocaseDict)):
+    def convert_array(value):
+        if strict:
+            try:
+                return map(scalar, value)
+            except (TypeError, ValueError):
+                # Array with NULL or nested members.
+                pass
+        return [convert(v) for v in value]
+
+    def convert_tuple(value):
+        return (convert(v) for v in value)
+
+    def convert_dict(value):
         return wbem.NocaseDict(
-            dict((k, _do_cast(t, v, cast)) for k, v in value.iteritems()))
-    elif isinstance(value, list):
-        return [_do_cast(t, v, cast) for v in value]
-    elif isinstance(value, tuple):
-        return (_do_cast(t, v, cast) for v in value)
-    return cast_func(value) if value is not None else value
+            dict((k, convert(v)) for k, v in value.iteritems()))
+
+    # Types checked for subclasses, in order of precedence.
+    bases = (
+        ((dict, wbem.NocaseDict), convert_dict),
+        (list, convert_array),
+        (tuple, convert_tuple),
+    )
+
+    # Conversions of value types; other types are looked up in bases once.
+    conversions = {
+        list: convert_array,
+        tuple: convert_tuple,
+        dict: convert_dict,
+        wbem.NocaseDict: convert_dict,
+    }
+
+    def conversion(t):
+        for types, container in bases:
+            if issubclass(t, types):
+                break
+        else:
+            container = scalar
+        conversions[t] = container
+        return container
+
+    def convert(value):
+        if value is None:
+            return value
+        container = conversions.get(type(value))
+        if container is None:
+            container = conversion(type(value))
+        return container(value)
+
+    return convert
+
+
+# Converters are compiled once per CIM type; see cim_converter() and
+# lmi_converter().
+_TO_CIM = dict((t, _compile(scalar, strict=True)) for t, scalar in {
+    'sint8': wbem.Sint8,
+    'uint8': wbem.Uint8,
+    'sint16': wbem.Sint16,
+    'uint16': wbem.Uint16,
+    'sint32': wbem.Sint32,
+    'uint32': wbem.Uint32,
+    'sint64': wbem.Sint64,
+    'uint64': wbem.Uint64,
+}.iteritems())
+_TO_CIM['string'] = _compile(_to_unicode)
+_TO_CIM['reference'] = _compile(_to_path)
+
+_TO_LMI = dict((t, _compile(int, strict=True)) for t in (
+    'sint8', 'uint8', 'sint16', 'uint16',
+    'sint32', 'uint32', 'sint64', 'uint64'))
+
+_IDENTITY = _compile(_identity)
+
+
+def _converter(converters, t):
+    try:
+        return converters[t]
+    except KeyError:
+        # Remember converters of type names in other cases, too.
+        converter = converters[t] = converters.get(t.lower(), _IDENTITY)
+        return converter
+
+
+def cim_converter(t):
+    '''
+    Returns a function, which casts values of CIM type t to CIM type.
+    '''
+    return _converter(_TO_CIM, t)
+
+
+def lmi_converter(t):
+    '''
+    Returns a function, which casts values of CIM type t to LMI (python)
+    type.
+    '''
+    return _converter(_TO_LMI, t)
 
 
 def to_cim(t, value):
     '''
     Casts the value to CIM type.
     '''
-    cast = {
-        'sint8': lambda x: wbem.Sint8(x),
-        'uint8': lambda x: wbem.Uint8(x),
-        'sint16': lambda x: wbem.Sint16(x),
-        'uint16': lambda x: wbem.Uint16(x),
-        'sint32': lambda x: wbem.Sint32(x),
-        'uint32': lambda x: wbem.Uint32(x),
-        'sint64': lambda x: wbem.Sint64(x),
-        'uint64': lambda x: wbem.Uint64(x),
-        'string': lambda x: unicode(x, 'utf-8') if isinstance(x, str) else x,
-        'reference': lambda x: instance_to_path(x)
-    }
-    return _do_cast(t, value, cast)
+    return _converter(_TO_CIM, t)(value)
 
 
 def to_lmi(t, value):
     '''
     Casts the value to LMI (python) type.
     '''
-    cast = {
-        'sint8': lambda x: int(x),
-        'uint8': lambda x: int(x),
-        'sint16': lambda x: int(x),
-        'uint16': lambda x: int(x),
-        'sint32': lambda x: int(x),
-        'uint32': lambda x: int(x),
-        'sint64': lambda x: int(x),
-        'uint64': lambda x: int(x),
-    }
-    return _do_cast(t, value, cast)
+    return _converter(_TO_LMI, t)(value)
@@ -0,0 +1,245 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Columnar materialization of instances. Properties of many instances are
+stored column by column: scalar numeric properties in :py:mod:`array`
+arrays, other properties in lists. No LMI wrappers are created, which keeps
+large enumerations compact; see :py:meth:`.LMIClass.columns`.
+
+If NumPy is installed, columns can be converted to NumPy arrays.
+'''
+
+from array import array
+from collections import OrderedDict
+
+from lmi.shell.util import cast
+
+try:
+    import numpy
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+def _wide_typecode(typecode):
+    '''
+    Returns typecode, if its items have at least 64 bits; None otherwise.
+    '''
+    return typecode if array(typecode).itemsize >= 8 else None
+
+
+# Array typecodes of scalar CIM types; other types are stored in lists.
+_TYPECODES = {
+    'sint8': 'b',
+    'uint8': 'B',
+    'sint16': 'h',
+    'uint16': 'H',
+    'sint32': 'i',
+    'uint32': 'I',
+    'sint64': _wide_typecode('l'),
+    'uint64': _wide_typecode('L'),
+    'real32': 'f',
+    'real64': 'd',
+}
+
+
+class LMIColumn(object):
+    '''
+    Values of one property of all rows. Scalar numeric properties are kept
+    in an :py:class:`array.array` with row indices of NULL values in nulls;
+    other properties are kept in a list, where NULL is None.
+
+    :param string name: property name
+    :param string cim_type: CIM type of the property
+    :param bool is_array: whether the property is a CIM array
+    '''
+    def __init__(self, name, cim_type, is_array=False):
+        self.name = name
+        self.type = cim_type
+        typecode = None if is_array else _TYPECODES.get(cim_type)
+        if typecode is None:
+            self.values = []
+            self.convert = cast.lmi_converter(cim_type)
+        else:
+            self.values = array(typecode)
+            self.convert = None
+        self.nulls = set()
+
+    def __repr__(self):
+        return '%s(name=\'%s\', type=\'%s\', %d rows)' % (
+            self.__class__.__name__, self.name, self.type, len(self))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [
+                self[i] for i in xrange(*index.indices(len(self.values)))]
+        value = self.values[index]
+        if self.nulls:
+            if index < 0:
+                index += len(self.values)
+            if index in self.nulls:
+                return None
+        return value
+
+    def __iter__(self):
+        for index in xrange(len(self.values)):
+            yield self[index]
+
+    @property
+    def typecode(self):
+        '''
+        Typecode of the column's array; None, if values are kept in a list.
+        '''
+        return getattr(self.values, 'typecode', None)
+
+    def append(self, value):
+        if self.convert is not None:
+            self.values.append(self.convert(value))
+        elif value is None:
+            self.nulls.add(len(self.values))
+            self.values.append(0)
+        else:
+            self.values.append(value)
+
+    def fill(self, rows):
+        '''
+        Appends NULL values up to rows values.
+        '''
+        while len(self.values) < rows:
+            self.append(None)
+
+    def to_numpy(self):
+        '''
+        Returns a NumPy array of the column's values. Numeric columns with
+        NULL values are returned as masked arrays, other columns as arrays of
+        objects.
+
+        :raises: ImportError, if NumPy is not installed
+        '''
+        if not HAVE_NUMPY:
+            raise ImportError('NumPy is not installed')
+        if self.typecode is None:
+            result = numpy.empty(len(self.values), dtype=object)
+            for index, value in enumerate(self.values):
+                result[index] = value
+            return result
+        if not self.values:
+            return numpy.array([], dtype=self.typecode)
+        # Copy the data; the array may be reallocated by next appends.
+        result = numpy.frombuffer(self.values, dtype=self.typecode).copy()
+        if self.nulls:
+            mask = numpy.zeros(len(result), dtype=bool)
+            mask[list(self.nulls)] = True
+            result = numpy.ma.array(result, mask=mask)
+        return result
+
+
+class LMIColumns(object):
+    '''
+    Properties of many instances stored column by column. Columns are
+    created in order of first appearance of their properties; rows missing
+    a property have NULL in its column.
+
+    Example of usage:
+
+        cols = LMIColumns(['Name', 'PID'])
+        cols.extend(cim_instances)
+        cols['PID'].to_numpy()
+
+    :param names: names of properties to keep; None keeps all
+    '''
+    def __init__(self, names=None):
+        self.columns = OrderedDict()
+        self.rows = 0
+        # Columns by property names as spelled by instances; other
+        # spellings are looked up case-insensitively.
+        self.lookup = {}
+        self.wanted = None
+        if names is not None:
+            self.wanted = set(name.lower() for name in names)
+
+    def __repr__(self):
+        return '%s(%d columns, %d rows)' % (
+            self.__class__.__name__, len(self.columns), self.rows)
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name.lower() in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name.lower()]
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns.itervalues()]
+
+    def _column(self, prop):
+        '''
+        Returns a column of a property; None, if the property is not kept.
+        '''
+        try:
+            return self.lookup[prop.name]
+        except KeyError:
+            pass
+        key = prop.name.lower()
+        column = self.columns.get(key)
+        if column is None and (self.wanted is None or key in self.wanted):
+            column = self.columns[key] = LMIColumn(
+                prop.name, prop.type, prop.is_array)
+            column.fill(self.rows)
+        self.lookup[prop.name] = column
+        return column
+
+    def append(self, cim_inst):
+        '''
+        Appends properties of a :py:class:`wbem.CIMInstance` as a row.
+        '''
+        filled = 0
+        for prop in cim_inst.properties.itervalues():
+            column = self._column(prop)
+            if column is not None:
+                column.append(prop.value)
+                filled += 1
+        self.rows += 1
+        if filled < len(self.columns):
+            for column in self.columns.itervalues():
+                column.fill(self.rows)
+
+    def extend(self, cim_insts):
+        for cim_inst in cim_insts:
+            self.append(cim_inst)
+
+    def row(self, index):
+        '''
+        Returns a dictionary of property values of a row.
+        '''
+        return OrderedDict(
+            (column.name, column[index])
+            for column in self.columns.itervalues())
+
+    def to_numpy(self):
+        '''
+        Returns an ordered dictionary of NumPy arrays of the columns; see
+        :py:meth:`LMIColumn.to_numpy`.
+        '''
+        return OrderedDict(
+            (column.name, column.to_numpy())
+            for column in self.columns.itervalues())
@@ -0,0 +1,212 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Streaming export of instances to JSON Lines, CSV and MOF. Instances are
+written one by one as they are consumed, so exports of enumerations run in
+constant memory; see :py:meth:`.LMIClass.export`.
+
+Example of usage:
+
+    export(conn.root.cimv2.LMI_Account.instances(), 'accounts.jsonl.gz')
+'''
+
+import csv
+import gzip
+import json
+import os
+from collections import OrderedDict
+
+from lmi.shell.core import wbem
+
+# Export formats.
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+FORMAT_MOF = 'mof'
+
+FORMATS = (FORMAT_JSONL, FORMAT_CSV, FORMAT_MOF)
+
+
+def _plain(value):
+    '''
+    Returns a value converted to plain python types. CIM integers and reals
+    are converted to int and float, arrays member by member, other values
+    (datetimes, references, embedded objects) to unicode.
+    '''
+    if value is None or isinstance(value, (bool, basestring)):
+        return value
+    elif isinstance(value, (int, long)):
+        return int(value)
+    elif isinstance(value, float):
+        return float(value)
+    elif isinstance(value, list):
+        return [_plain(v) for v in value]
+    return unicode(value)
+
+
+def _properties(cim_inst, PropertyList):
+    '''
+    Returns a list of (name, property) pairs of an instance; properties from
+    PropertyList missing in the instance are (name, None).
+    '''
+    properties = cim_inst.properties
+    if PropertyList is None:
+        return properties.items()
+    return [
+        (name, properties[name] if name in properties else None)
+        for name in PropertyList]
+
+
+class _JSONLWriter(object):
+    def __init__(self, fileobj, PropertyList):
+        self.fileobj = fileobj
+        self.PropertyList = PropertyList
+
+    def write(self, cim_inst):
+        row = OrderedDict(
+            (name, _plain(prop.value) if prop is not None else None)
+            for name, prop in _properties(cim_inst, self.PropertyList))
+        self.fileobj.write(json.dumps(row, ensure_ascii=True))
+        self.fileobj.write('\n')
+
+
+class _CSVWriter(object):
+    '''
+    Writes a header and a row per instance. Columns are the properties from
+    PropertyList, or of the first instance. Arrays are written as JSON
+    lists, NULL values as empty cells.
+    '''
+    def __init__(self, fileobj, PropertyList):
+        self.writer = csv.writer(fileobj)
+        self.PropertyList = PropertyList
+        self.header = False
+
+    def write(self, cim_inst):
+        if not self.header:
+            if self.PropertyList is None:
+                self.PropertyList = cim_inst.properties.keys()
+            self.writer.writerow(
+                [name.encode('utf-8') for name in self.PropertyList])
+            self.header = True
+        self.writer.writerow([
+            self._cell(prop.value if prop is not None else None)
+            for name, prop in _properties(cim_inst, self.PropertyList)])
+
+    @staticmethod
+    def _cell(value):
+        value = _plain(value)
+        if value is None:
+            return ''
+        elif isinstance(value, list):
+            return json.dumps(value)
+        elif isinstance(value, unicode):
+            return value.encode('utf-8')
+        return value
+
+
+class _MOFWriter(object):
+    def __init__(self, fileobj, PropertyList):
+        self.fileobj = fileobj
+        self.PropertyList = PropertyList
+
+    def write(self, cim_inst):
+        if self.PropertyList is not None:
+            cim_inst = wbem.CIMInstance(
+                cim_inst.classname,
+                properties=dict(
+                    (prop.name, prop)
+                    for name, prop in _properties(cim_inst, self.PropertyList)
+                    if prop is not None),
+                path=cim_inst.path)
+        mof = cim_inst.tomof()
+        if isinstance(mof, unicode):
+            mof = mof.encode('utf-8')
+        self.fileobj.write(mof)
+        self.fileobj.write('\n')
+
+
+_WRITERS = {
+    FORMAT_JSONL: _JSONLWriter,
+    FORMAT_CSV: _CSVWriter,
+    FORMAT_MOF: _MOFWriter,
+}
+
+
+def _guess(filename, fmt, compress):
+    '''
+    Returns format and compression of an output file; the missing ones are
+    guessed from the file name, eg. 'dump.csv.gz'. Files without a known
+    extension are written as JSON Lines.
+    '''
+    name = os.path.basename(filename).lower() if filename else ''
+    if compress is None:
+        compress = name.endswith('.gz')
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if fmt is None:
+        fmt = os.path.splitext(name)[1][1:]
+        if fmt not in FORMATS and fmt != 'json':
+            fmt = FORMAT_JSONL
+    if fmt == 'json':
+        fmt = FORMAT_JSONL
+    if fmt not in FORMATS:
+        raise ValueError('Unknown export format: %s' % fmt)
+    return fmt, compress
+
+
+def export(instances, output, fmt=None, PropertyList=None, compress=None):
+    '''
+    Writes instances to a file as they are consumed and returns their
+    number.
+
+    :param instances: iterable of :py:class:`.LMIInstance` or
+        :py:class:`wbem.CIMInstance` objects; usually a generator returned
+        by :py:meth:`.LMIClass.instances` or an :py:class:`.Enumerator`.
+        Properties left out by a projection of the enumeration are not
+        fetched.
+    :param output: file name, or a file object open for writing
+    :param string fmt: :py:data:`FORMAT_JSONL`, :py:data:`FORMAT_CSV` or
+        :py:data:`FORMAT_MOF`; None guesses the format from the file name
+    :param list PropertyList: properties to export; None exports all
+    :param bool compress: whether to write gzip-compressed output; None
+        compresses files named \*.gz
+    '''
+    filename = output if isinstance(output, basestring) else \
+        getattr(output, 'name', None)
+    if not isinstance(filename, basestring):
+        filename = None
+    fmt, compress = _guess(filename, fmt, compress)
+
+    if isinstance(output, basestring):
+        fileobj = open(output, 'wb')
+    else:
+        fileobj = output
+    try:
+        stream = fileobj
+        if compress:
+            stream = gzip.GzipFile(fileobj=fileobj, mode='wb')
+        try:
+            writer = _WRITERS[fmt](stream, PropertyList)
+            cnt = 0
+            for inst in instances:
+                writer.write(getattr(inst, 'wrapped_object', inst))
+                cnt += 1
+        finally:
+            if compress:
+                stream.close()
+    finally:
+        if isinstance(output, basestring):
+            fileobj.close()
+    return cnt
@@ -0,0 +1,112 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Helpers for running blocking CIM operations in worker threads.
+'''
+
+import Queue
+import threading
+
+
+# Default number of worker threads.
+DEFAULT_WORKERS = 4
+
+# Maximum number of produced values waiting for the consumer.
+DEFAULT_QUEUE_SIZE = 1024
+
+# Markers of entries passed from worker threads to consumer.
+_VALUE, _ERROR, _DONE = range(3)
+
+# How often blocked queue operations check for a stop (seconds).
+_POLL_TIME = 0.1
+
+
+def stream(func, items, workers=DEFAULT_WORKERS,
+           queue_size=DEFAULT_QUEUE_SIZE):
+    '''
+    Calls func(item) for every item in up to workers threads; func returns
+    an iterable. Yields tuples (item, value, error) as the values are
+    produced, in no particular order. If func fails, (item, None, exception)
+    is yielded and other items are not affected.
+
+    If the consumer stops iterating, the workers stop and close unfinished
+    iterables returned by func.
+    '''
+    items = list(items)
+    pending = Queue.Queue()
+    for item in items:
+        pending.put(item)
+    results = Queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(entry):
+        # Don't block forever, if the consumer is gone.
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=_POLL_TIME)
+                return
+            except Queue.Full:
+                pass
+
+    def worker():
+        try:
+            while not stop.is_set():
+                try:
+                    item = pending.get_nowait()
+                except Queue.Empty:
+                    break
+                try:
+                    values = iter(func(item))
+                    try:
+                        for value in values:
+                            put((_VALUE, item, value))
+                            if stop.is_set():
+                                break
+                    finally:
+                        if hasattr(values, 'close'):
+                            values.close()
+                except Exception as e:
+                    put((_ERROR, item, e))
+        finally:
+            # Even exceptions, which are not errors of func (such as
+            # KeyboardInterrupt), must not leave the consumer waiting.
+            put((_DONE, None, None))
+
+    threads = [
+        threading.Thread(target=worker)
+        for i in xrange(min(workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        running = len(threads)
+        while running:
+            try:
+                # Poll, so the consumer can be interrupted.
+                kind, item, value = results.get(timeout=_POLL_TIME)
+            except Queue.Empty:
+                continue
+            if kind == _VALUE:
+                yield item, value, None
+            elif kind == _ERROR:
+                yield item, None, value
+            else:
+                running -= 1
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,124 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+PropertyList projection of instance enumerations. An enumeration either uses
+a PropertyList declared by the caller, or a learned one (PropertyList='auto'),
+which consists of properties read from instances returned by previous
+enumerations of the same kind. Instances returned by a projected enumeration
+fetch missing properties on first access.
+'''
+
+# PropertyList value, which selects a learned projection.
+PROPERTY_LIST_AUTO = 'auto'
+
+
+class PropertyTracker(object):
+    '''
+    Records, which properties are read from instances returned by
+    enumerations. Enumerations are identified by keys; see :py:func:`key`.
+    '''
+    def __init__(self):
+        self.used = {}
+
+    def __repr__(self):
+        return '%s(%d enumerations)' % (
+            self.__class__.__name__, len(self.used))
+
+    def property_list(self, key):
+        '''
+        Returns a sorted list of properties read from instances returned by
+        enumeration identified by key; None, if nothing was learned, yet.
+        '''
+        used = self.used.get(key)
+        if not used:
+            return None
+        return sorted(used)
+
+    def touch(self, key, name):
+        '''
+        Records, that property name was read from an instance returned by
+        enumeration identified by key.
+        '''
+        used = self.used.get(key)
+        if used is None:
+            used = self.used[key] = set()
+        used.add(name.lower())
+
+    def reset(self):
+        '''
+        Forgets all learned projections.
+        '''
+        self.used.clear()
+
+
+class Projection(object):
+    '''
+    Projection of one enumeration, shared by all returned instances.
+
+    :param list property_list: properties requested from CIMOM; None, if all
+        of them were requested
+    :param PropertyTracker tracker: tracker of read properties
+    :param key: key of the enumeration in tracker
+    '''
+    def __init__(self, property_list, tracker=None, key=None):
+        self.property_list = property_list
+        self.tracker = tracker
+        self.key = key
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self.property_list)
+
+    @property
+    def partial(self):
+        return self.property_list is not None
+
+    def touch(self, name):
+        if self.tracker is not None:
+            self.tracker.touch(self.key, name)
+
+
+def key(*args):
+    '''
+    Returns an enumeration key made of the operation's name and arguments.
+    Strings are compared case-insensitively.
+    '''
+    return tuple(
+        a.lower() if isinstance(a, basestring) else a for a in args)
+
+
+def resolve(conn, PropertyList, enum_key):
+    '''
+    Returns a PropertyList for an enumeration and a :py:class:`Projection`
+    for its instances; the projection is None, if no projection is used.
+
+    :param conn: :py:class:`.LMIConnection` object
+    :param PropertyList: None, list of property names, or
+        :py:data:`PROPERTY_LIST_AUTO`
+    :param enum_key: enumeration key created by :py:func:`key`
+    '''
+    if PropertyList is None:
+        return None, None
+    elif PropertyList == PROPERTY_LIST_AUTO:
+        tracker = getattr(conn, 'property_tracker', None)
+        if tracker is None:
+            return None, None
+        property_list = tracker.property_list(enum_key)
+        return property_list, Projection(property_list, tracker, enum_key)
+    elif isinstance(PropertyList, basestring):
+        raise ValueError(
+            'PropertyList must be a list, None or \'%s\'' % PROPERTY_LIST_AUTO)
+    property_list = list(PropertyList)
+    return property_list, Projection(property_list)
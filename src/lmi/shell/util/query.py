@@ -0,0 +1,139 @@
+# Copyright (C) 2015 Peter Hatina <phatina@redhat.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''
+Instance filters. A filter is a dictionary of property names and values; an
+instance matches the filter, if all the properties have the given values.
+Filters are translated into FilterQuery (DMTF:FQL) of pull operations, or into
+CQL/WQL queries for ExecQuery; if CIMOM supports neither, they are evaluated
+on client side.
+'''
+
+QUERY_TYPE_FQL = 'DMTF:FQL'
+QUERY_TYPE_CQL = 'DMTF:CQL'
+QUERY_TYPE_WQL = 'WQL'
+
+
+def _unwrap(value):
+    '''
+    Returns a wrapped CIM object of LMI objects; value otherwise.
+    '''
+    if hasattr(value, 'wrapped_object'):
+        return value.wrapped_object
+    return value
+
+
+def literal(value):
+    '''
+    Returns a query literal for value; None, if the value can't be expressed
+    in a query.
+    '''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    elif isinstance(value, (int, long)):
+        return str(int(value))
+    elif isinstance(value, float):
+        return repr(value)
+    elif isinstance(value, basestring):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+    return None
+
+
+class Query(object):
+    '''
+    Instance filter.
+
+    :param dictionary inst_filter: property names and values, which matching
+        instances must have
+    '''
+    def __init__(self, inst_filter=None):
+        inst_filter = inst_filter or {}
+        self.conditions = [
+            (name, _unwrap(value))
+            for name, value in sorted(inst_filter.iteritems())]
+
+    def __nonzero__(self):
+        return bool(self.conditions)
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self.to_fql())
+
+    @property
+    def names(self):
+        '''
+        Returns a list of property names used in the filter.
+        '''
+        return [name for name, value in self.conditions]
+
+    @property
+    def expressible(self):
+        '''
+        Returns True, if the filter can be evaluated by CIMOM.
+        '''
+        return all(
+            value is None or literal(value) is not None
+            for name, value in self.conditions)
+
+    def where(self):
+        '''
+        Returns a condition of the filter shared by FQL, CQL and WQL.
+        '''
+        def condition(name, value):
+            if value is None:
+                return '%s IS NULL' % name
+            return '%s = %s' % (name, literal(value))
+
+        return ' AND '.join(
+            condition(name, value) for name, value in self.conditions)
+
+    def to_fql(self):
+        '''
+        Returns the filter as FilterQuery for pull operations.
+        '''
+        return self.where()
+
+    def to_cql(self, classname):
+        '''
+        Returns the filter as CQL query.
+        '''
+        return 'SELECT * FROM %s WHERE %s' % (classname, self.where())
+
+    def to_wql(self, classname):
+        '''
+        Returns the filter as WQL query.
+        '''
+        return 'SELECT * FROM %s WHERE %s' % (classname, self.where())
+
+    def match(self, cim_obj):
+        '''
+        Returns True, if CIM instance or instance name matches the filter.
+        '''
+        if hasattr(cim_obj, 'keybindings'):
+            values = cim_obj.keybindings
+        else:
+            values = cim_obj.properties
+
+        for name, value in self.conditions:
+            if name not in values:
+                return False
+            member = values[name]
+            if hasattr(member, 'value'):
+                # CIMProperty
+                member = member.value
+            if member != value:
+                return False
+        return True
@@ -3,6 +3,71 @@ from lmi.shell import obj
 from lmi.shell.core import wbem
 
 
+def _instance_to_lmi(conn, value):
+    return obj.LMIInstance(conn, value)
+
+
+def _instance_name_to_lmi(conn, value):
+    return obj.LMIInstanceName(conn, value)
+
+
+def _int_to_lmi(conn, value):
+    return int(value)
+
+
+def _float_to_lmi(conn, value):
+    return float(value)
+
+
+def _dict_to_lmi(conn, value):
+    return wbem.NocaseDict(
+        dict(
+            (k, to_lmi(conn, v))
+            for k, v in value.iteritems()))
+
+
+def _list_to_lmi(conn, value):
+    return [to_lmi(conn, val) for val in value]
+
+
+def _tuple_to_lmi(conn, value):
+    return (to_lmi(conn, val) for val in value)
+
+
+def _value_to_lmi(conn, value):
+    return value
+
+
+# Transformations of values to LMI objects by exact type of the value; filled
+# on demand by _transformation().
+_TO_LMI = {}
+
+
+def _transformation(cls):
+    '''
+    Returns a function, which transforms values of type cls into LMI objects.
+    The result is remembered, so subclass checks are run once per type.
+    '''
+    if issubclass(cls, wbem.CIMInstance):
+        func = _instance_to_lmi
+    elif issubclass(cls, wbem.CIMInstanceName):
+        func = _instance_name_to_lmi
+    elif issubclass(cls, wbem.CIMInt):
+        func = _int_to_lmi
+    elif issubclass(cls, wbem.CIMFloat):
+        func = _float_to_lmi
+    elif issubclass(cls, (dict, wbem.NocaseDict)):
+        func = _dict_to_lmi
+    elif issubclass(cls, list):
+        func = _list_to_lmi
+    elif issubclass(cls, tuple):
+        func = _tuple_to_lmi
+    else:
+        func = _value_to_lmi
+    _TO_LMI[cls] = func
+    return func
+
+
 def to_lmi(conn, value):
     '''
     Transforms returned values from a method call into LMI wrapped objects.
@@ -15,25 +80,11 @@ def to_lmi(conn, value):
         :mod:`wbem` one
     :returns: transformed py::mod:`wbem` object into LMIShell one
     '''
-    if isinstance(value, wbem.CIMInstance):
-        namespace = value.path.namespace if value.path else None
-        return obj.LMIInstance(conn, value)
-    elif isinstance(value, wbem.CIMInstanceName):
-        return obj.LMIInstanceName(conn, value)
-    elif isinstance(value, wbem.CIMInt):
-        return int(value)
-    elif isinstance(value, wbem.CIMFloat):
-        return float(value)
-    elif isinstance(value, (dict, wbem.NocaseDict)):
-        return wbem.NocaseDict(
-            dict(
-                (k, to_lmi(conn, v))
-                for k, v in value.iteritems()))
-    elif isinstance(value, list):
-        return [to_lmi(conn, val) for val in value]
-    elif isinstance(value, tuple):
-        return (to_lmi(conn, val) for val in value)
-    return value
+    cls = type(value)
+    func = _TO_LMI.get(cls)
+    if func is None:
+        func = _transformation(cls)
+    return func(conn, value)
 
 
 def to_cim_param(t, value):